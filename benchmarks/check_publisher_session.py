@@ -0,0 +1,161 @@
+# Checks how publishing uses its session against the Tableau stand-in: publish cycles share one sign-in and
+# project lookup, a 401 signs in again, a 404 drops the cached project and data source IDs, and either is retried
+# only once.
+#
+#   PYTHONPATH=src python -m benchmarks.check_publisher_session
+#
+# Exits with an error on the first failed check. Checks raise explicitly, so they also run under python -O.
+from typing import Any, Callable
+
+from .run import _REQUIRED_TABBY_ARGS
+
+
+def main() -> None:
+    from tempfile import TemporaryDirectory
+
+    from tabby.args import Args, configure
+
+    with TemporaryDirectory(prefix='tabby-check-', ignore_cleanup_errors=True) as datasource_dir:
+        configure(Args([*_REQUIRED_TABBY_ARGS, '--tableau_datasource_dir', datasource_dir]))
+
+        _check_cycles_reuse_session()
+        _check_auth_error_signs_in_again()
+        _check_not_signed_in_signs_in_again()
+        _check_lookup_error_drops_cached_ids()
+        _check_retries_once()
+        _check_other_errors_are_not_retried()
+
+    print('Publisher session checks passed')
+
+
+def _check_cycles_reuse_session() -> None:
+    server = _reset_publisher()
+
+    # Each publish cycle runs every data source's upload on the shared session.
+    for _ in range(2):
+        for _ in range(3):
+            _check(_with_session(lambda project_id: 'published') == 'published', 'a publish should succeed')
+
+    _check(server.sign_ins == 1, f'two cycles should sign in once, signed in {server.sign_ins} times')
+    _check(server.project_lookups == 1, f'two cycles should look up the project once, looked up {server.project_lookups} times')
+
+
+def _check_auth_error_signs_in_again() -> None:
+    from tableauserverclient import ServerResponseError
+
+    server = _reset_publisher()
+    action = _FailingAction(ServerResponseError('401002', 'Unauthorized', 'The session expired'))
+
+    _check(_with_session(action) == 'published', 'a 401 should be retried')
+    _check(len(action.auth_tokens) == 2, f'expected 2 attempts, got {len(action.auth_tokens)}')
+    _check(action.auth_tokens[0] != action.auth_tokens[1], 'a 401 should sign in again before the retry')
+    _check(server.auth_token == action.auth_tokens[1], 'the retry should use the new session')
+
+
+def _check_not_signed_in_signs_in_again() -> None:
+    from tableauserverclient import NotSignedInError
+
+    server = _reset_publisher()
+    action = _FailingAction(NotSignedInError('Not signed in'), sign_out=server.auth.sign_out)
+
+    _check(_with_session(action) == 'published', 'NotSignedInError should be retried')
+    _check(action.auth_tokens[0] != action.auth_tokens[1], 'NotSignedInError should sign in again before the retry')
+
+
+def _check_lookup_error_drops_cached_ids() -> None:
+    from tableauserverclient import ServerResponseError
+
+    from tabby import cloud_publisher
+
+    _reset_publisher()
+    cloud_publisher._project_id = 'deleted-project'
+    cloud_publisher._datasource_ids['Defect'] = 'deleted-datasource'
+    action = _FailingAction(ServerResponseError('404004', 'Not Found', 'The project does not exist'))
+
+    _check(_with_session(action) == 'published', 'a 404 should be retried')
+    _check(action.project_ids[0] == 'deleted-project', 'the first attempt should use the cached project')
+    _check(action.project_ids[1] not in (None, 'deleted-project'), 'a 404 should resolve the project again')
+    _check(not any(cloud_publisher._datasource_ids), 'a 404 should drop the cached data source IDs')
+    _check(action.auth_tokens[0] == action.auth_tokens[1], 'a 404 should keep the session')
+
+
+def _check_retries_once() -> None:
+    from tableauserverclient import ServerResponseError
+
+    _reset_publisher()
+    error = ServerResponseError('401002', 'Unauthorized', 'The session expired')
+    action = _FailingAction(error, failures=2)
+
+    _assert_raises(error, lambda: _with_session(action))
+    _check(len(action.auth_tokens) == 2, f'expected a single retry, got {len(action.auth_tokens) - 1}')
+
+
+def _check_other_errors_are_not_retried() -> None:
+    from tableauserverclient import ServerResponseError
+
+    for error in (ValueError('Bad payload'), ServerResponseError('409093', 'Conflict', 'The job is still running')):
+        _reset_publisher()
+        action = _FailingAction(error)
+
+        _assert_raises(error, lambda: _with_session(action))
+        _check(len(action.auth_tokens) == 1, f'{error!r} should not be retried')
+
+
+class _FailingAction:
+    # A publish that raises error on its first failures calls, and records the session of every call.
+    # sign_out is called before each failure, for errors that mean the session is gone.
+    def __init__(self, error: Exception, failures: int = 1, sign_out: Callable[[], None] | None = None):
+        self.auth_tokens: list[str] = []
+        self.project_ids: list[str] = []
+        self._error = error
+        self._failures = failures
+        self._sign_out = sign_out
+
+    def __call__(self, project_id: str) -> str:
+        from tabby import cloud_publisher
+
+        self.auth_tokens.append(cloud_publisher._server.auth_token)
+        self.project_ids.append(project_id)
+        if len(self.auth_tokens) <= self._failures:
+            if self._sign_out is not None:
+                self._sign_out()
+            raise self._error
+
+        return 'published'
+
+
+def _reset_publisher() -> Any:
+    from tabby import cloud_publisher
+
+    from .fakes import FakeTableauServer
+
+    cloud_publisher._server = FakeTableauServer()
+    cloud_publisher._auth = None
+    cloud_publisher._project_id = None
+    cloud_publisher._datasource_ids.clear()
+    return cloud_publisher._server
+
+
+def _with_session(action: Callable[[str], str]) -> str:
+    from tabby.cloud_publisher import _with_session
+
+    return _with_session(action)
+
+
+def _assert_raises(error: Exception, function: Callable[[], Any]) -> None:
+    try:
+        function()
+    except Exception as ex:
+        _check(ex is error, f'expected {error!r}, got {ex!r}')
+        return
+
+    raise AssertionError(f'expected {error!r} to be raised')
+
+
+def _check(condition: bool, message: str) -> None:
+    if not condition:
+        raise AssertionError(message)
+
+
+if __name__ == '__main__':
+    main()
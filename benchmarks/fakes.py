@@ -0,0 +1,153 @@
+from itertools import count
+from os.path import getsize
+from threading import Lock
+from time import sleep
+from types import SimpleNamespace
+from typing import Any
+
+
+class FakeRally:
+    # Stands in for pyral's Rally in tabby.rally, serving generated records with the paging arguments tabby uses.
+    def __init__(self, records_by_entity: dict[str, list[dict[str, Any]]], page_latency: float = 0.0):
+        self._records_by_entity = records_by_entity
+        self._page_latency = page_latency
+
+    def get(
+        self,
+        entity: str,
+        pagesize: int = 200,
+        start: int = 1,
+        limit: int | None = None,
+        **_: Any
+    ) -> 'FakeRallyResponse':
+        records = self._records_by_entity.get(entity, [])
+        end = len(records) if limit is None else min(len(records), start - 1 + limit)
+        return FakeRallyResponse(records, start - 1, end, pagesize, self._page_latency)
+
+
+class FakeRallyResponse:
+    def __init__(self, records: list[dict[str, Any]], begin: int, end: int, pagesize: int, page_latency: float):
+        self.resultCount = len(records)
+        self.errors = []
+        self._records = records
+        self._begin = begin
+        self._end = end
+        self._pagesize = pagesize
+        self._page_latency = page_latency
+
+    def __iter__(self):
+        for i in range(self._begin, self._end):
+            if self._page_latency and (i - self._begin) % self._pagesize == 0:
+                sleep(self._page_latency)
+
+            # A copy, since pyral builds a new entity object for every record.
+            yield SimpleNamespace(**self._records[i])
+
+
+class FakeTableauServer:
+    # Stands in for tableauserverclient's Server in tabby.cloud_publisher. Uploads read the whole file,
+    # and take at least the time the file would need at upload_mbps when it is set.
+    def __init__(self, upload_mbps: float = 0.0, job_seconds: float = 0.0):
+        self.server_address = 'https://tableau.example.com'
+        self.auth = SimpleNamespace(sign_in=self._sign_in, sign_out=self._sign_out)
+        self.projects = SimpleNamespace(filter=self._filter_projects, create=self._create_project)
+        self.datasources = SimpleNamespace(
+            publish=self._publish,
+            filter=self._filter_datasources,
+            update_hyper_data=self._update_hyper_data
+        )
+        self.jobs = SimpleNamespace(wait_for_job=self._wait_for_job)
+
+        self.uploaded_bytes = 0
+        self.requests = 0
+        self.sign_ins = 0
+        self.project_lookups = 0
+        self._auth_token: str | None = None
+        self._upload_mbps = upload_mbps
+        self._job_seconds = job_seconds
+        self._projects: dict[str, str] = {}
+        self._datasources: dict[tuple[str, str], str] = {}
+        self._ids = count(1)
+        self._lock = Lock()
+
+    @property
+    def auth_token(self) -> str:
+        from tableauserverclient import NotSignedInError
+
+        # Like Server.auth_token, which raises rather than returning None.
+        if self._auth_token is None:
+            raise NotSignedInError('Missing authentication token. You must sign in first.')
+        return self._auth_token
+
+    def is_signed_in(self) -> bool:
+        return self._auth_token is not None
+
+    def _sign_in(self, _: Any) -> None:
+        self._count_request()
+        with self._lock:
+            self.sign_ins += 1
+        self._auth_token = f'token-{next(self._ids)}'
+
+    def _sign_out(self) -> None:
+        self._count_request()
+        self._auth_token = None
+
+    def _filter_projects(self, name: str) -> list[SimpleNamespace]:
+        self._count_request()
+        with self._lock:
+            self.project_lookups += 1
+        return [SimpleNamespace(name=name, id=project_id) for project_name, project_id in self._projects.items() if project_name == name]
+
+    def _create_project(self, project: Any) -> SimpleNamespace:
+        self._count_request()
+        with self._lock:
+            project_id = self._projects.setdefault(project.name, f'project-{next(self._ids)}')
+        return SimpleNamespace(name=project.name, id=project_id)
+
+    def _filter_datasources(self, name: str) -> list[SimpleNamespace]:
+        self._count_request()
+        return [
+            SimpleNamespace(name=datasource_name, project_id=project_id, id=datasource_id)
+            for (project_id, datasource_name), datasource_id in self._datasources.items() if datasource_name == name
+        ]
+
+    def _publish(self, datasource: Any, file: str, _mode: Any, as_job: bool = False) -> SimpleNamespace:
+        from pathlib import PurePath
+
+        self._upload(file)
+        with self._lock:
+            key = (datasource.project_id, PurePath(file).stem)
+            self._datasources.setdefault(key, f'datasource-{next(self._ids)}')
+        return SimpleNamespace(id=f'job-{next(self._ids)}', finish_code=0)
+
+    def _update_hyper_data(self, _datasource_id: str, *, request_id: str, actions: list[Any], payload: str) -> SimpleNamespace:
+        self._upload(payload)
+        return SimpleNamespace(id=f'job-{next(self._ids)}', finish_code=0)
+
+    def _wait_for_job(self, job: Any, timeout: float | None = None) -> Any:
+        self._count_request()
+        if self._job_seconds:
+            sleep(self._job_seconds)
+        return job
+
+    def _upload(self, file: str) -> None:
+        from time import perf_counter
+
+        self._count_request()
+        start_time = perf_counter()
+        size = getsize(file)
+        with open(file, 'rb') as stream:
+            while stream.read(1 << 20):
+                pass
+
+        with self._lock:
+            self.uploaded_bytes += size
+
+        if self._upload_mbps:
+            remaining = size * 8 / (self._upload_mbps * 1_000_000) - (perf_counter() - start_time)
+            if remaining > 0:
+                sleep(remaining)
+
+    def _count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
@@ -0,0 +1,339 @@
+# Benchmarks the bulk load, webhook and publish paths against a real local Hyper process,
+# with generated Rally data and in-process stand-ins for Rally and Tableau.
+#
+#   PYTHONPATH=src python -m benchmarks.run --rows 50000 --webhooks 5000 --output results.json -- --rally_webhook_batch
+#
+# Arguments after -- are passed to tabby. Results are written as JSON. Startup is measured in separate
+# interpreters, with and without --lazy_start and --run_as_script.
+import sys
+from argparse import ArgumentParser, Namespace
+from typing import Any
+
+_REQUIRED_TABBY_ARGS = [
+    '--ngrok_auth_token', 'benchmark',
+    '--tableau_token_name', 'benchmark',
+    '--tableau_token_value', 'benchmark',
+    '--rally_apikey', 'benchmark',
+]
+
+
+def main() -> None:
+    from contextlib import redirect_stdout
+    from json import dumps
+    from tempfile import TemporaryDirectory
+
+    bench_args, tabby_argv = _parse_args()
+
+    # Measured first, so these hyper processes start while this process has none running.
+    with redirect_stdout(sys.stderr):
+        startup_results = _benchmark_startup(bench_args, tabby_argv)
+
+    with TemporaryDirectory(prefix='tabby-benchmark-', ignore_cleanup_errors=True) as datasource_dir:
+        from tabby.args import Args, configure
+
+        configure(Args([
+            *_REQUIRED_TABBY_ARGS,
+            '--rally_entities', bench_args.entities,
+            '--rally_get_limit', str(bench_args.rows),
+            '--rally_webhook_buffer', '0',
+            '--rally_refresh_on_start',
+            '--tableau_datasource_dir', datasource_dir,
+            *tabby_argv
+        ]))
+
+        # tabby prints load progress, which must not end up in the results.
+        with redirect_stdout(sys.stderr):
+            results = {'startup': startup_results, **_run(bench_args)}
+
+        from tabby.hyper import _close_all_connections
+        _close_all_connections()
+
+    report = {
+        'parameters': {**vars(bench_args), 'tabby_args': tabby_argv},
+        'environment': _get_environment(),
+        'results': results
+    }
+
+    output = dumps(report, indent=2)
+    if bench_args.output == '-':
+        print(output)
+    else:
+        with open(bench_args.output, 'w') as file:
+            file.write(output + '\n')
+        print(f'Wrote {bench_args.output}', file=sys.stderr)
+
+
+def _parse_args() -> tuple[Namespace, list[str]]:
+    arg_parser = ArgumentParser(description='Benchmark Tabby with generated data.')
+    arg_parser.add_argument('--entities', type=str, default='Defect,HierarchicalRequirement')
+    arg_parser.add_argument('--rows', type=int, default=20000, help='Generated records per entity.')
+    arg_parser.add_argument('--custom_fields', type=int, default=10, help='Custom fields per generated record.')
+    arg_parser.add_argument('--webhooks', type=int, default=2000, help='Generated webhooks per entity, for each webhook benchmark.')
+    arg_parser.add_argument('--rally_page_latency', type=float, default=0.0, help='Seconds the Rally stand-in takes per page.')
+    arg_parser.add_argument('--upload_mbps', type=float, default=0.0, help='Upload speed of the Tableau stand-in. 0 is unlimited.')
+    arg_parser.add_argument('--startup_samples', type=int, default=5, help='Starts measured per startup mode. 0 skips them.')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--output', type=str, default='-', help='The results file, or - for stdout.')
+
+    argv = sys.argv[1:]
+    tabby_argv: list[str] = []
+    if '--' in argv:
+        tabby_argv = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+
+    return arg_parser.parse_args(argv), tabby_argv
+
+
+def _run(bench_args: Namespace) -> dict[str, Any]:
+    from .fakes import FakeRally, FakeTableauServer
+    from .synthetic import generate_rally_records, generate_webhooks
+
+    entities = bench_args.entities.split(',')
+    records_by_entity = {
+        entity: generate_rally_records(entity, bench_args.rows, bench_args.custom_fields, seed=bench_args.seed + i)
+        for i, entity in enumerate(entities)
+    }
+
+    from tabby import cloud_publisher, rally
+
+    rally._rally = FakeRally(records_by_entity, bench_args.rally_page_latency)
+    cloud_publisher._server = FakeTableauServer(bench_args.upload_mbps)
+
+    results: dict[str, Any] = {'bulk_load': _benchmark_bulk_load(len(entities) * bench_args.rows)}
+
+    direct_webhooks = []
+    processor_webhooks = []
+    for i, entity in enumerate(entities):
+        direct_webhooks += generate_webhooks(entity, bench_args.webhooks, bench_args.rows, seed=bench_args.seed + i)
+        processor_webhooks += generate_webhooks(
+            entity, bench_args.webhooks, bench_args.rows,
+            start_timestamp=1_800_000_000_000, seed=bench_args.seed + len(entities) + i
+        )
+
+    results['publish_full'] = _benchmark_publish(cloud_publisher._server)
+    results['webhook_decode'], decoded_webhooks = _benchmark_decode(direct_webhooks)
+    results['process_changes'] = _benchmark_process_changes(decoded_webhooks)
+    results['webhook_processor'] = _benchmark_webhook_processor(processor_webhooks)
+    results['publish_after_webhooks'] = _benchmark_publish(cloud_publisher._server)
+    return results
+
+
+def _benchmark_startup(bench_args: Namespace, tabby_argv: list[str]) -> dict[str, Any]:
+    from json import loads
+    from os import environ, pathsep
+    from os.path import abspath
+    from statistics import median
+    from subprocess import run
+    from tempfile import TemporaryDirectory
+
+    # Each start is a fresh interpreter, with persisted but empty databases and no publishing, so it measures
+    # imports, configuration and starting clients rather than loading. See benchmarks.startup.
+    results: dict[str, Any] = {'samples': bench_args.startup_samples}
+    if bench_args.startup_samples <= 0:
+        return results
+
+    environment = {**environ, 'PYTHONPATH': pathsep.join(abspath(path) for path in sys.path if path)}
+    excluded_args = (
+        '--lazy_start', '--run_as_script', '--tableau_publish', '--rally_refresh_on_start', '--rally_incremental_sync'
+    )
+    tabby_argv = [arg for arg in tabby_argv if arg not in excluded_args]
+    # script_via_app starts a script through the Flask app module, as python -m tabby.tabby does.
+    # It is what every script start paid before script mode skipped the app.
+    modes = (
+        ('eager', [], []),
+        ('lazy', [], ['--lazy_start']),
+        ('script_via_app', ['--import_app'], ['--run_as_script']),
+        ('script_eager', [], ['--run_as_script']),
+        ('script_lazy', [], ['--run_as_script', '--lazy_start'])
+    )
+    for mode, startup_argv, mode_argv in modes:
+        samples = []
+        for _ in range(bench_args.startup_samples):
+            with TemporaryDirectory(prefix='tabby-benchmark-startup-', ignore_cleanup_errors=True) as datasource_dir:
+                completed = run(
+                    [
+                        sys.executable, '-m', 'benchmarks.startup',
+                        *startup_argv,
+                        *_REQUIRED_TABBY_ARGS,
+                        '--rally_entities', bench_args.entities,
+                        '--hyper_persist',
+                        '--tableau_datasource_dir', datasource_dir,
+                        *mode_argv,
+                        *tabby_argv
+                    ],
+                    cwd=datasource_dir, env=environment, capture_output=True, text=True, check=True
+                )
+                # tabby logs to stdout too, so the measurement is the last line.
+                samples.append(loads(completed.stdout.strip().splitlines()[-1]))
+
+        results[mode] = {
+            key: median(sample[key] for sample in samples)
+            for key in ('import_seconds', 'ready_seconds', 'started_seconds')
+        }
+
+    # --lazy_start defers work to the background rather than skipping it, so only the time to ready should drop.
+    results['ready_reduction'] = 1 - results['lazy']['ready_seconds'] / results['eager']['ready_seconds']
+    results['script_ready_reduction'] = 1 - results['script_lazy']['ready_seconds'] / results['script_eager']['ready_seconds']
+    results['script_app_ready_reduction'] = \
+        1 - results['script_lazy']['ready_seconds'] / results['script_via_app']['ready_seconds']
+    return results
+
+
+def _benchmark_bulk_load(row_count: int) -> dict[str, Any]:
+    from time import perf_counter
+
+    from tabby.hyper import start_hyper
+
+    # With --rally_refresh_on_start this is _create_tables_with_rally_data, plus opening connections and indexing.
+    start_time = perf_counter()
+    start_hyper()
+    seconds = perf_counter() - start_time
+
+    return {'rows': row_count, 'seconds': seconds, 'rows_per_second': row_count / seconds}
+
+
+def _benchmark_decode(webhook_payloads: list[dict[str, Any]]) -> tuple[dict[str, Any], list[Any]]:
+    from time import perf_counter
+
+    from tabby.request_schemas import Webhook
+
+    start_time = perf_counter()
+    webhooks = [Webhook.from_json(webhook_payload) for webhook_payload in webhook_payloads]
+    seconds = perf_counter() - start_time
+
+    return {'webhooks': len(webhooks), 'seconds': seconds, 'webhooks_per_second': len(webhooks) / seconds}, webhooks
+
+
+def _benchmark_process_changes(webhooks: list[Any]) -> dict[str, Any]:
+    from time import perf_counter
+
+    from tabby.hyper import process_changes
+
+    latencies = []
+    start_time = perf_counter()
+    for webhook in sorted(webhooks, key=lambda queued_webhook: queued_webhook.message.transaction.timestamp):
+        webhook_start_time = perf_counter()
+        process_changes(webhook)
+        latencies.append(perf_counter() - webhook_start_time)
+    seconds = perf_counter() - start_time
+
+    return {
+        'webhooks': len(webhooks),
+        'seconds': seconds,
+        'webhooks_per_second': len(webhooks) / seconds,
+        'latency_ms': _summarize_latencies(latencies)
+    }
+
+
+def _benchmark_webhook_processor(webhook_payloads: list[dict[str, Any]]) -> dict[str, Any]:
+    from threading import Lock
+    from time import perf_counter, sleep
+
+    from tabby import hyper
+    from tabby.request_schemas import Webhook
+    from tabby.webhook_processer import enqueue_webhook_for_processing, get_queue_depth, start_webhook_processor
+
+    webhooks = [Webhook.from_json(webhook_payload) for webhook_payload in webhook_payloads]
+
+    # Measure from enqueue until the processor has applied each webhook. Coalesced webhooks are
+    # applied under the ID of the last webhook they merged.
+    enqueue_times: dict[str, float] = {}
+    apply_times: dict[str, float] = {}
+    in_flight = [0]
+    lock = Lock()
+
+    def timed(function, get_webhooks):
+        def apply(*function_args):
+            with lock:
+                in_flight[0] += 1
+            try:
+                return function(*function_args)
+            finally:
+                now = perf_counter()
+                with lock:
+                    in_flight[0] -= 1
+                    for applied_webhook in get_webhooks(function_args):
+                        apply_times[applied_webhook.message.message_id] = now
+
+        return apply
+
+    hyper.process_changes = timed(hyper.process_changes, lambda function_args: [function_args[0]])
+    hyper.process_changes_batch = timed(hyper.process_changes_batch, lambda function_args: function_args[1])
+    start_webhook_processor()
+
+    start_time = perf_counter()
+    for webhook in webhooks:
+        enqueue_times[webhook.message.message_id] = perf_counter()
+        enqueue_webhook_for_processing(webhook)
+    enqueue_seconds = perf_counter() - start_time
+
+    # Wait until the queues stay empty with nothing being applied.
+    idle_polls = 0
+    while idle_polls < 5:
+        sleep(0.01)
+        with lock:
+            is_idle = get_queue_depth() == 0 and in_flight[0] == 0
+        idle_polls = idle_polls + 1 if is_idle else 0
+
+    seconds = max(apply_times.values(), default=start_time) - start_time
+    latencies = [apply_time - enqueue_times[message_id] for message_id, apply_time in apply_times.items()]
+
+    return {
+        'webhooks': len(webhooks),
+        'applied_writes': len(apply_times),
+        'enqueue_seconds': enqueue_seconds,
+        'seconds': seconds,
+        'webhooks_per_second': len(webhooks) / seconds if seconds else None,
+        'latency_ms': _summarize_latencies(latencies)
+    }
+
+
+def _benchmark_publish(server: Any) -> dict[str, Any]:
+    from time import perf_counter
+
+    from tabby.cloud_publisher import _publish_all_data_sources
+
+    uploaded_bytes = server.uploaded_bytes
+    requests = server.requests
+
+    start_time = perf_counter()
+    _publish_all_data_sources()
+    seconds = perf_counter() - start_time
+
+    return {
+        'seconds': seconds,
+        'uploaded_mb': (server.uploaded_bytes - uploaded_bytes) / 1_000_000,
+        'requests': server.requests - requests
+    }
+
+
+def _summarize_latencies(latencies: list[float]) -> dict[str, float | None]:
+    if not latencies:
+        return {'p50': None, 'p99': None, 'max': None}
+
+    latencies = sorted(latencies)
+
+    def percentile(fraction: float) -> float:
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+    return {'p50': percentile(0.50), 'p99': percentile(0.99), 'max': latencies[-1] * 1000}
+
+
+def _get_environment() -> dict[str, Any]:
+    from datetime import datetime, timezone
+    from os import cpu_count
+    from platform import platform, python_version
+    from subprocess import run
+
+    commit = run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': python_version(),
+        'platform': platform(),
+        'cpus': cpu_count()
+    }
+
+
+if __name__ == '__main__':
+    main()
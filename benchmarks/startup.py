@@ -0,0 +1,45 @@
+# Measures one start of Tabby in a fresh interpreter, until it is ready to accept webhooks.
+# Run by benchmarks.run in a subprocess per sample, with the tabby arguments after the module name.
+# A leading --import_app imports the Flask app in script mode too, like starting through python -m tabby.tabby.
+# ngrok and the server are not started. Connecting to Rally is left out, since it depends on the network.
+import sys
+from time import perf_counter
+
+
+def main() -> None:
+    from json import dumps
+
+    start_time = perf_counter()
+
+    argv = sys.argv[1:]
+    import_app = argv[:1] == ['--import_app']
+    if import_app:
+        argv = argv[1:]
+
+    from tabby.args import Args, configure
+    config = configure(Args(argv))
+
+    # Like tabby_start.main, script mode does not import the Flask app.
+    if import_app or not config.run_as_script:
+        import tabby.tabby  # noqa: F401
+    from tabby.tabby_start import start_services, wait_for_start
+    import_seconds = perf_counter() - start_time
+
+    if not config.lazy_start:
+        # The eager start still imports pyral and creates the client, but against a stand-in.
+        from tabby import rally
+
+        from .fakes import FakeRally
+        rally._rally = FakeRally({})
+
+    start_services()
+    ready_seconds = perf_counter() - start_time
+
+    wait_for_start()
+    started_seconds = perf_counter() - start_time
+
+    print(dumps({'import_seconds': import_seconds, 'ready_seconds': ready_seconds, 'started_seconds': started_seconds}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+from random import Random
+from typing import Any
+from uuid import NAMESPACE_URL, UUID, uuid5
+
+_SCHEDULE_STATES = ['Defined', 'In-Progress', 'Completed', 'Accepted']
+_SEVERITIES = ['Minor Problem', 'Major Problem', 'Crash/Data Loss', 'Cosmetic']
+_USERS = [('alice', 'alice@example.com'), ('bob', 'bob@example.com'), ('carol', 'carol@example.com')]
+
+
+def generate_rally_records(entity: str, count: int, custom_fields: int = 10, seed: int = 0) -> list[dict[str, Any]]:
+    # Records shaped like the __dict__ of pyral entities: Rally attribute names, ISO timestamps with a Z,
+    # collections as lists, and the private/oid attributes that tabby skips.
+    random = Random(seed)
+    records = []
+    for i in range(count):
+        record = {
+            'oid': 10_000 + i,
+            '_ref': f'https://rally1.rallydev.com/slm/webservice/v2.0/{entity.lower()}/{10_000 + i}',
+            '_type': entity,
+            '_objectVersion': random.randint(1, 50),
+            'ObjectID': 10_000 + i,
+            'ObjectUUID': object_uuid(entity, i),
+            'FormattedID': f'{entity[:2].upper()}{i}',
+            'Name': f'{entity} {i} {random.choice(_SEVERITIES)}',
+            'Description': random.choice([None, '', f'<p>Description of {entity} {i}</p>']),
+            'CreationDate': _timestamp(random, 2023),
+            'LastUpdateDate': _timestamp(random, 2024),
+            'ScheduleState': random.choice(_SCHEDULE_STATES),
+            'PlanEstimate': random.choice([None, 1.0, 2.0, 3.0, 5.0, 8.0]),
+            'TaskEstimateTotal': round(random.uniform(0, 40), 1),
+            'DirectChildrenCount': random.randint(0, 5),
+            'Blocked': random.random() < 0.1,
+            'Ready': random.random() < 0.5,
+            'Tasks': [None] * random.randint(0, 6),
+            'Tags': [None] * random.randint(0, 3),
+        }
+        for field in range(custom_fields):
+            record[f'c_Custom{field}'] = random.choice([None, f'Value {random.randint(0, 20)}'])
+
+        records.append(record)
+
+    return records
+
+
+def generate_webhooks(
+    entity: str,
+    count: int,
+    existing_count: int,
+    updated_ratio: float = 0.8,
+    created_ratio: float = 0.1,
+    start_timestamp: int = 1_700_000_000_000,
+    seed: int = 0
+) -> list[dict[str, Any]]:
+    # Payloads valid for Webhook.from_json. Updated and Recycled webhooks target the first existing_count records
+    # of generate_rally_records, and Created webhooks create new objects.
+    random = Random(seed)
+    webhooks = []
+    created = 0
+    for i in range(count):
+        roll = random.random()
+        timestamp = start_timestamp + i
+
+        if roll < updated_ratio:
+            action = 'Updated'
+            object_id = object_uuid(entity, random.randrange(existing_count))
+            changes = {'Name': _change('Name', f'{entity} renamed {i}', 'STRING')}
+            if random.random() < 0.3:
+                changes['ScheduleState'] = _change('ScheduleState', random.choice(_SCHEDULE_STATES), 'STRING')
+            if random.random() < 0.3:
+                changes['Tasks'] = _collection_change('Tasks', random.randint(0, 2), random.randint(0, 1))
+            state = {}
+        elif roll < updated_ratio + created_ratio:
+            action = 'Created'
+            object_id = object_uuid(entity, existing_count + created)
+            created += 1
+            changes = {}
+            state = {
+                'ObjectUUID': _attribute('ObjectUUID', object_id, 'STRING'),
+                'ObjectID': _attribute('ObjectID', 1_000_000 + i, 'INTEGER'),
+                'Name': _attribute('Name', f'New {entity} {i}', 'STRING'),
+                'ScheduleState': _attribute('ScheduleState', 'Defined', 'STRING'),
+                'CreationDate': _attribute('CreationDate', '2024-06-01T12:00:00.000Z', 'DATE'),
+                'Tasks': _attribute('Tasks', [], 'COLLECTION'),
+            }
+        else:
+            action = 'Recycled'
+            object_id = object_uuid(entity, random.randrange(existing_count))
+            changes = {}
+            state = {}
+
+        username, email = random.choice(_USERS)
+        webhooks.append({
+            'message': {
+                'object_id': object_id,
+                'ref': f'https://rally1.rallydev.com/slm/webservice/v2.0/{entity.lower()}/{object_id}',
+                'object_type': entity,
+                'transaction': {
+                    'trace_id': str(_uuid(random)),
+                    'timestamp': timestamp,
+                    'user': {'uuid': str(_uuid(random)), 'username': username, 'email': email},
+                    'message_id': str(_uuid(random)),
+                    'parent_span_id': str(_uuid(random)),
+                    'span_id': str(_uuid(random)),
+                    'message_lag': random.randint(0, 500),
+                },
+                'state': state,
+                'subscription_id': 100,
+                'message_id': str(_uuid(random)),
+                'project': {'uuid': str(_uuid(random)), 'name': 'Benchmark Project'},
+                'id': str(_uuid(random)),
+                'detail_link': 'https://rally1.rallydev.com/#/detail',
+                'message_version': 1,
+                'changes': changes,
+                'action': action,
+            },
+            'rule': {
+                'LastUpdateDate': '2024-01-01T00:00:00.000Z',
+                'Expressions': [{'AttributeID': None, 'AttributeName': 'Project', 'Operator': '=', 'Value': 'x'}],
+                'SubscriptionID': 100,
+                'LastWebhookResponseTime': None,
+                'ObjectTypes': [entity],
+                'LastSuccess': None,
+                'LastStatus': None,
+                'OwnerID': str(_uuid(random)),
+                'FireCount': None,
+                'TargetUrl': 'https://example.com/webhooks',
+                'CreatedBy': None,
+                'Disabled': False,
+                'ErrorCount': None,
+                'Name': 'Benchmark',
+                'LastFailure': None,
+                'AppName': 'tabby',
+                'ObjectUUID': str(_uuid(random)),
+                'CreationDate': '2024-01-01T00:00:00.000Z',
+                'AppUrl': 'https://example.com',
+                '_objectVersion': 1,
+                '_type': 'Webhook',
+            },
+            'Timestamp': '2024-06-01T12:00:00.000Z',
+        })
+
+    return webhooks
+
+
+def object_uuid(entity: str, index: int) -> str:
+    return str(uuid5(NAMESPACE_URL, f'{entity}/{index}'))
+
+
+def _timestamp(random: Random, year: int) -> str:
+    return (
+        f'{year}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}'
+        f'T{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}.{random.randint(0, 999):03d}Z'
+    )
+
+
+def _uuid(random: Random) -> UUID:
+    return UUID(int=random.getrandbits(128), version=4)
+
+
+def _attribute(name: str, value: Any, value_type: str) -> dict[str, Any]:
+    return {'value': value, 'type': value_type, 'name': name, 'display_name': name, 'ref': None}
+
+
+def _change(name: str, value: Any, value_type: str) -> dict[str, Any]:
+    return {
+        'value': value, 'old_value': None, 'added': None, 'removed': None,
+        'type': value_type, 'name': name, 'display_name': name, 'ref': None
+    }
+
+
+def _collection_change(name: str, added: int, removed: int) -> dict[str, Any]:
+    def objects(count: int) -> list[dict[str, Any]]:
+        return [
+            {'name': f'{name} {i}', 'formatted_id': None, 'ref': None, 'detail_link': None, 'id': str(i), 'object_type': name}
+            for i in range(count)
+        ]
+
+    return {
+        'value': None, 'old_value': None, 'added': objects(added), 'removed': objects(removed),
+        'type': 'COLLECTION', 'name': name, 'display_name': name, 'ref': None
+    }
@@ -1,5 +1,9 @@
+from threading import Lock
+from typing import Any, cast
+
+
 class Args:
-    def __init__(self):
+    def __init__(self, argv: list[str] | None = None):
         from argparse import ArgumentParser
 
         arg_parser = ArgumentParser(description='Start Tabby - Tableau/Rally Integration.')
@@ -12,6 +16,18 @@ class Args:
             '--port', type=int, default=5000,
             help='The port of the local development server. Default: 5000.'
         )
+        arg_parser.add_argument(
+            '--server', type=str, choices=['development', 'waitress'], default='development',
+            help='The server that receives webhooks. waitress is a multi-threaded production server and requires the waitress package. Default: development.'
+        )
+        arg_parser.add_argument(
+            '--server_threads', type=int, default=8,
+            help='The number of threads that handle requests when using the waitress server. Default: 8.'
+        )
+        arg_parser.add_argument(
+            '--lazy_start', action='store_true',
+            help='Enables deferring startup work. Rally is connected on the first request for Rally data, and hyper and publishing start in the background while webhooks are already being accepted. Cannot be used with --rally_refresh_on_start or --rally_incremental_sync unless running as a script.'
+        )
 
         # ngrok
         arg_parser.add_argument(
@@ -56,6 +72,30 @@ class Args:
             '--tableau_publish', action='store_true',
             help='Enables publishing to Tableau Cloud/Server.'
         )
+        arg_parser.add_argument(
+            '--tableau_publish_concurrency', type=int, default=4,
+            help='The maximum number of data sources published to Tableau Cloud/Server at once. Default: 4.'
+        )
+        arg_parser.add_argument(
+            '--tableau_publish_min_interval', type=str, default='',
+            help='The minimum seconds between publishes of a data source, as a default and/or per entity, e.g., 60,DefectSuite=600. Default: no minimum.'
+        )
+        arg_parser.add_argument(
+            '--tableau_publish_max_interval', type=str, default='',
+            help='The maximum seconds a data source can go without being published, even when unchanged, as a default and/or per entity, e.g., 3600,Defect=600. Default: unchanged data sources are not republished.'
+        )
+        arg_parser.add_argument(
+            '--tableau_publish_delta', action='store_true',
+            help='Publishes only the rows changed by webhooks since the last publish, when possible, instead of overwriting the whole data source.'
+        )
+        arg_parser.add_argument(
+            '--hyper_convert_processes', type=int, default=0,
+            help='The number of worker processes that convert Rally records into rows during bulk loads. 0 converts on threads in this process.'
+        )
+        arg_parser.add_argument(
+            '--hyper_persist', action='store_true',
+            help='Enables reopening the existing hyper databases on start instead of replacing them. Column definitions are restored from the <entity>.json file next to each database.'
+        )
 
         # Rally
         arg_parser.add_argument(
@@ -76,19 +116,88 @@ class Args:
             '--rally_get_pagesize', type=int, default=150,
             help='The page size for every Rally get request. Determines performance and stability while retrieving large datasets.'
         )
+        arg_parser.add_argument(
+            '--rally_fetch_concurrency', type=int, default=1,
+            help='The maximum number of Rally pages requested at once across all entities while loading. Values above 1 fetch pages in parallel.'
+        )
+        arg_parser.add_argument(
+            '--rally_fetch_retries', type=int, default=3,
+            help='The number of times a failed Rally page request is retried with exponential backoff when fetching pages in parallel.'
+        )
         arg_parser.add_argument(
             '--rally_webhook_buffer', type=int, default=2,
             help='The seconds to account for random latency from Rally when receiving webhooks. Helps to ensure that webhooks are processed in chronological order. Adds delay.'
         )
+        arg_parser.add_argument(
+            '--rally_webhook_coalesce', action='store_true',
+            help='Enables merging webhooks for the same object while they wait in the buffer, so that each object is written at most once per flush.'
+        )
+        arg_parser.add_argument(
+            '--rally_webhook_queue_limit', type=int, default=10000,
+            help='The maximum number of queued webhooks. Webhooks received beyond it are refused with 503, so Rally retries them later. 0 means unlimited. Default: 10000.'
+        )
+        arg_parser.add_argument(
+            '--rally_webhook_dedup_size', type=int, default=10000,
+            help='The number of recent webhook message IDs remembered to drop redelivered webhooks. 0 disables deduplication. Default: 10000.'
+        )
+        arg_parser.add_argument(
+            '--rally_webhook_dedup_ttl', type=int, default=3600,
+            help='The seconds a webhook message ID is remembered for deduplication. Default: 3600.'
+        )
+        arg_parser.add_argument(
+            '--rally_webhook_journal', action='store_true',
+            help='Enables writing accepted webhooks to a journal before acknowledging them, so that webhooks not yet applied are replayed after a restart. Replay requires --hyper_persist.'
+        )
         arg_parser.add_argument(
             '--rally_refresh_on_start', action='store_true',
             help='Enables refreshing the local Rally data on start. This can be time consuming.'
         )
+        arg_parser.add_argument(
+            '--rally_stream_load', action='store_true',
+            help='Enables streaming Rally pages straight into the hyper databases while loading, so memory is bounded by a few pages instead of the whole dataset.'
+        )
+        arg_parser.add_argument(
+            '--rally_stream_sample_size', type=int, default=1000,
+            help='The number of records used to discover columns and types when streaming. Columns that are empty for every sampled record are excluded.'
+        )
+        arg_parser.add_argument(
+            '--rally_incremental_sync', action='store_true',
+            help='Enables syncing only the Rally records changed since the last sync into the existing hyper databases on start. Entities that were never synced are fully loaded.'
+        )
+        arg_parser.add_argument(
+            '--rally_webhook_batch', action='store_true',
+            help='Enables applying every webhook that has cleared the buffer in a single transaction per entity. Reduces hyper round-trips during bursts of Rally changes.'
+        )
+        arg_parser.add_argument(
+            '--rally_webhook_workers', type=int, default=1,
+            help='The number of threads that apply webhooks. Entities are spread across workers and each entity is always applied in order by the same worker.'
+        )
+
+        # Profiling
+        arg_parser.add_argument(
+            '--profile', action='store_true',
+            help='Enables writing a timing report per phase and entity for each bulk load and for the first webhooks processed, to the profiles directory in the data source directory.'
+        )
+        arg_parser.add_argument(
+            '--profile_cprofile', action='store_true',
+            help='Enables capturing cProfile stats next to each profiling report, as a .prof file. Requires --profile. Adds overhead while profiling.'
+        )
+        arg_parser.add_argument(
+            '--profile_webhook_seconds', type=int, default=300,
+            help='The seconds of webhook processing profiled after start when profiling. 0 profiles only bulk loads. Default: 300.'
+        )
 
-        parsed_args = arg_parser.parse_args()
+        parsed_args = arg_parser.parse_args(argv)
+        if parsed_args.lazy_start and not parsed_args.run_as_script and \
+                (parsed_args.rally_refresh_on_start or parsed_args.rally_incremental_sync):
+            # Webhooks accepted while hyper loads would be applied on top of Rally data fetched after they happened.
+            arg_parser.error('--lazy_start cannot be used with --rally_refresh_on_start or --rally_incremental_sync')
 
         self.run_as_script = bool(parsed_args.run_as_script)
         self.port = int(parsed_args.port)
+        self.server = str(parsed_args.server)
+        self.server_threads = int(parsed_args.server_threads)
+        self.lazy_start = bool(parsed_args.lazy_start)
 
         self.ngrok_auth_token = str(parsed_args.ngrok_auth_token)
         self.ngrok_domain = str(parsed_args.ngrok_domain)
@@ -101,13 +210,71 @@ class Args:
         self.tableau_datasource_dir = str(parsed_args.tableau_datasource_dir)
         self.tableau_publish_frequency = int(parsed_args.tableau_publish_frequency)
         self.tableau_publish = bool(parsed_args.tableau_publish)
+        self.tableau_publish_concurrency = int(parsed_args.tableau_publish_concurrency)
+        self.tableau_publish_min_interval = _parse_entity_seconds(parsed_args.tableau_publish_min_interval)
+        self.tableau_publish_max_interval = _parse_entity_seconds(parsed_args.tableau_publish_max_interval)
+        self.tableau_publish_delta = bool(parsed_args.tableau_publish_delta)
+        self.hyper_convert_processes = int(parsed_args.hyper_convert_processes)
+        self.hyper_persist = bool(parsed_args.hyper_persist)
 
         self.rally_apikey = str(parsed_args.rally_apikey)
         self.rally_entities = str(parsed_args.rally_entities).split(',')
         self.rally_get_limit = int(parsed_args.rally_get_limit)
         self.rally_get_pagesize = int(parsed_args.rally_get_pagesize)
+        self.rally_fetch_concurrency = int(parsed_args.rally_fetch_concurrency)
+        self.rally_fetch_retries = int(parsed_args.rally_fetch_retries)
         self.rally_webhook_buffer = int(parsed_args.rally_webhook_buffer)
+        self.rally_webhook_coalesce = bool(parsed_args.rally_webhook_coalesce)
+        self.rally_webhook_queue_limit = int(parsed_args.rally_webhook_queue_limit)
+        self.rally_webhook_dedup_size = int(parsed_args.rally_webhook_dedup_size)
+        self.rally_webhook_dedup_ttl = int(parsed_args.rally_webhook_dedup_ttl)
+        self.rally_webhook_journal = bool(parsed_args.rally_webhook_journal)
         self.rally_refresh_on_start = bool(parsed_args.rally_refresh_on_start)
+        self.rally_stream_load = bool(parsed_args.rally_stream_load)
+        self.rally_stream_sample_size = int(parsed_args.rally_stream_sample_size)
+        self.rally_incremental_sync = bool(parsed_args.rally_incremental_sync)
+        self.rally_webhook_batch = bool(parsed_args.rally_webhook_batch)
+        self.rally_webhook_workers = int(parsed_args.rally_webhook_workers)
+
+        self.profile = bool(parsed_args.profile)
+        self.profile_cprofile = bool(parsed_args.profile_cprofile)
+        self.profile_webhook_seconds = int(parsed_args.profile_webhook_seconds)
+
+
+def _parse_entity_seconds(value: str) -> dict[str, int]:
+    # Parses e.g. "60,DefectSuite=600" into {'': 60, 'DefectSuite': 600}. The '' key holds the default for all entities.
+    entity_seconds: dict[str, int] = {}
+    for item in str(value).split(','):
+        if not item.strip():
+            continue
+
+        entity, _, seconds = item.rpartition('=')
+        entity_seconds[entity.strip()] = int(seconds)
+
+    return entity_seconds
+
+
+class _ConfiguredArgs:
+    # Parses the command line on first use, unless configure() was called first.
+    def __getattr__(self, name: str) -> Any:
+        if '_configured' not in self.__dict__:
+            configure()
+        if name not in self.__dict__:
+            raise AttributeError(name)
+
+        return self.__dict__[name]
+
+
+_configure_lock = Lock()
+
+
+def configure(config: Args | None = None) -> Args:
+    # Sets the args read by every module, e.g. configure(Args(argv)). Without a config, the command line is parsed.
+    with _configure_lock:
+        config = config or Args()
+        args.__dict__.update(vars(config), _configured=True)
+
+    return config
 
 
-args = Args()
+args = cast(Args, _ConfiguredArgs())
@@ -1,13 +1,30 @@
 from logging import getLogger
-from typing import cast
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, TypeVar, cast
 
 from tableauserverclient import PersonalAccessTokenAuth, Server
 
+if TYPE_CHECKING:
+    from .hyper import PublishDelta
+
 _logger = getLogger(__name__)
 
+T = TypeVar('T')
+
 _auth: PersonalAccessTokenAuth | None = None
 _server: Server | None = None
 
+# The session stays signed in between cycles, and the resolved IDs are kept until a request fails with them.
+_session_lock = Lock()
+_project_id: str | None = None
+_datasource_ids: dict[str, str] = {}
+
+# The hyper change version and time of each entity's last successful publish.
+_published_versions: dict[str, int] = {}
+_published_times: dict[str, float] = {}
+
+_PUBLISH_JOB_TIMEOUT_SECONDS = 3600
+
 
 def start_cloud_publisher() -> None:
     from .args import args
@@ -37,33 +54,246 @@ def _cloud_publisher():
 
 
 def _publish_all_data_sources():
-    from pathlib import PurePath
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .args import args
+    from .metrics import PUBLISH_CYCLE_SECONDS
+
+    entity_data_sources = [entity for entity in args.rally_entities if _should_publish(entity)]
+    if not any(entity_data_sources):
+        return
+
+    # Every upload shares the signed-in session. Total time is roughly that of the largest data source.
+    with PUBLISH_CYCLE_SECONDS.time(), ThreadPoolExecutor(max_workers=args.tableau_publish_concurrency) as executor:
+        for entity_data_source in entity_data_sources:
+            executor.submit(_publish_data_source, entity_data_source)
+
+
+def _publish_data_source(entity_data_source: str) -> None:
+    from time import time
+
+    from .args import args
+    from .hyper import get_change_version, restore_publish_delta, take_publish_delta
+    from .metrics import PUBLISH_FAILURES
+
+    # Read the version and delta first, so changes made while publishing are published next time.
+    change_version = get_change_version(entity_data_source)
+    delta = take_publish_delta(entity_data_source) if args.tableau_publish_delta else None
+
+    def publish(project_id: str) -> None:
+        datasource_id = None
+        if delta is not None and delta.entity_ids() and entity_data_source in _published_versions:
+            datasource_id = _get_datasource_id(project_id, entity_data_source)
+
+        if datasource_id is None:
+            _publish_full(project_id, entity_data_source)
+        else:
+            _publish_delta(datasource_id, entity_data_source, delta)
+
+    try:
+        _with_session(publish)
+        _published_versions[entity_data_source] = change_version
+        _published_times[entity_data_source] = time()
+    except Exception as ex:
+        if args.tableau_publish_delta:
+            restore_publish_delta(entity_data_source, delta)
+        PUBLISH_FAILURES.inc(entity_data_source)
+        _logger.error(f'Failed to publish {entity_data_source}: {ex}')
+
+
+def _with_session(action: Callable[[str], T]) -> T:
+    # Runs action with the project ID on the cached session. An auth failure signs in again,
+    # and a missing project or data source drops the cached IDs, before the one retry.
+    for attempt in range(2):
+        auth_token, project_id = _get_session()
+        try:
+            return action(project_id)
+        except Exception as ex:
+            if attempt > 0 or not _reset_session(ex, auth_token):
+                raise
+
+            _logger.info('Refreshed the Tableau session, retrying')
+
+
+def _get_session() -> tuple[str, str]:
+    global _server, _auth, _project_id
+    with _session_lock:
+        if not _server.is_signed_in():
+            _server.auth.sign_in(_auth)
+            _logger.info(f'Signed in to {_server.server_address}')
+
+        if _project_id is None:
+            _project_id = _get_project_id()
+
+        return _server.auth_token, _project_id
+
+
+def _reset_session(ex: Exception, auth_token: str) -> bool:
+    from tableauserverclient import NotSignedInError, ServerResponseError
+
+    global _server, _auth, _project_id
+    is_auth_error = isinstance(ex, NotSignedInError) or \
+        (isinstance(ex, ServerResponseError) and str(ex.code).startswith('401'))
+    is_lookup_error = isinstance(ex, ServerResponseError) and str(ex.code).startswith('404')
+
+    with _session_lock:
+        if is_auth_error:
+            # Another publish may have already signed in again after the same failure.
+            # auth_token raises when the session is gone, so check that first.
+            if not _server.is_signed_in() or _server.auth_token == auth_token:
+                _server.auth.sign_in(_auth)
+                _logger.info(f'Signed in again to {_server.server_address}')
+            return True
+
+        if is_lookup_error:
+            _project_id = None
+            _datasource_ids.clear()
+            return True
+
+    return False
+
+
+def _get_project_id() -> str:
+    from tableauserverclient import ProjectItem
+
+    from .args import args
+
+    global _server
+    for project in _server.projects.filter(name=args.tableau_project_name):
+        if project.name == args.tableau_project_name:
+            return project.id
+
+    project = ProjectItem(args.tableau_project_name)
+    return cast(ProjectItem, _server.projects.create(project)).id
+
+
+def _get_datasource_id(project_id: str, entity_data_source: str) -> str | None:
+    global _server
+    with _session_lock:
+        if entity_data_source in _datasource_ids:
+            return _datasource_ids[entity_data_source]
+
+    for datasource in _server.datasources.filter(name=entity_data_source):
+        if datasource.name == entity_data_source and datasource.project_id == project_id:
+            with _session_lock:
+                _datasource_ids[entity_data_source] = datasource.id
+            return datasource.id
+
+    return None
+
+
+def _publish_full(project_id: str, entity_data_source: str) -> None:
+    from os.path import getsize
+    from pathlib import Path
+    from time import time
+
+    from tableauserverclient import DatasourceItem
+
+    from .hyper import create_snapshot
+    from .metrics import PUBLISH_BYTES, PUBLISH_SECONDS
+
+    global _server
+    publish_mode = Server.PublishMode.Overwrite
+
+    # Publish from a snapshot, so the live connection keeps applying webhooks during the upload.
+    file = create_snapshot(entity_data_source)
+    file_size = getsize(file)
+
+    # The snapshot is a full copy of the data source, so it is deleted once the job is done with it, even on failure.
+    try:
+        start_time = time()
+        datasource = DatasourceItem(project_id)
+        job = _server.datasources.publish(datasource, file, publish_mode, as_job=True)
+        upload_seconds = time() - start_time
+
+        job = _server.jobs.wait_for_job(job, timeout=_PUBLISH_JOB_TIMEOUT_SECONDS)
+        job_seconds = time() - start_time
+    finally:
+        Path(file).unlink(missing_ok=True)
+    PUBLISH_SECONDS.observe(entity_data_source, 'full', value=job_seconds)
+    PUBLISH_BYTES.inc(entity_data_source, 'full', amount=file_size)
+
+    _logger.info(
+        f'Published {entity_data_source} ({file_size / 1_000_000:.2f} MB) '
+        f'uploaded in {upload_seconds:.1f}s, job {job.id} finished with code {job.finish_code} in {job_seconds:.1f}s'
+    )
 
-    from tableauserverclient import Pager, DatasourceItem, ProjectItem
+
+def _publish_delta(datasource_id: str, entity_data_source: str, delta: 'PublishDelta') -> None:
+    from os.path import getsize
+    from pathlib import Path
+    from time import time
+    from uuid import uuid4
+
+    from .hyper import create_delta_snapshot
+    from .metrics import PUBLISH_BYTES, PUBLISH_SECONDS
+
+    global _server
+
+    # The payload holds the changed objects' ObjectUUIDs and current rows. Deleting every listed object and
+    # inserting the current rows applies creates, updates and recycles alike.
+    file = create_delta_snapshot(entity_data_source, delta.entity_ids())
+    file_size = getsize(file)
+
+    actions = [
+        {
+            'action': 'delete',
+            'source-schema': 'public',
+            'source-table': 'ObjectUUIDs',
+            'target-schema': 'public',
+            'target-table': entity_data_source,
+            'condition': {'op': 'eq', 'target-col': 'ObjectUUID', 'source-col': 'ObjectUUID'}
+        },
+        {
+            'action': 'insert',
+            'source-schema': 'public',
+            'source-table': entity_data_source,
+            'target-schema': 'public',
+            'target-table': entity_data_source
+        }
+    ]
+
+    try:
+        start_time = time()
+        job = _server.datasources.update_hyper_data(
+            datasource_id, request_id=str(uuid4()), actions=actions, payload=file
+        )
+        upload_seconds = time() - start_time
+
+        job = _server.jobs.wait_for_job(job, timeout=_PUBLISH_JOB_TIMEOUT_SECONDS)
+        job_seconds = time() - start_time
+    finally:
+        Path(file).unlink(missing_ok=True)
+    PUBLISH_SECONDS.observe(entity_data_source, 'delta', value=job_seconds)
+    PUBLISH_BYTES.inc(entity_data_source, 'delta', amount=file_size)
+
+    _logger.info(
+        f'Published {entity_data_source} delta ({file_size / 1_000_000:.2f} MB, {len(delta.inserted)} created, '
+        f'{len(delta.updated)} updated, {len(delta.deleted)} recycled) uploaded in {upload_seconds:.1f}s, '
+        f'job {job.id} finished with code {job.finish_code} in {job_seconds:.1f}s'
+    )
+
+
+def _should_publish(entity_data_source: str) -> bool:
+    from time import time
 
     from .args import args
-    from .hyper import close_connection, init_connection
-
-    global _server, _auth
-    with _server.auth.sign_in(_auth):
-        project_id: str | None = None
-        for project in Pager(_server.projects):
-            if project.name == args.tableau_project_name:
-                project_id = project.id
-
-        if project_id is None:
-            project = ProjectItem(args.tableau_project_name)
-            project_id = cast(ProjectItem, _server.projects.create(project)).id
-
-        # TODO: Publish each data source in parallel if possible.
-        publish_mode = Server.PublishMode.Overwrite
-        for entity_data_source in args.rally_entities:
-            close_connection(entity_data_source)
-            try:
-                datasource = DatasourceItem(project_id)
-                file = PurePath(args.tableau_datasource_dir, f'{entity_data_source}.hyper')
-                _server.datasources.publish(datasource, str(file), publish_mode, as_job=True)
-            except Exception as ex:
-                _logger.error(str(ex))
-            finally:
-                init_connection(entity_data_source)
+    from .hyper import get_change_version
+
+    if entity_data_source not in _published_times:
+        return True
+
+    since_published = time() - _published_times[entity_data_source]
+    min_interval = args.tableau_publish_min_interval.get(entity_data_source, args.tableau_publish_min_interval.get(''))
+    max_interval = args.tableau_publish_max_interval.get(entity_data_source, args.tableau_publish_max_interval.get(''))
+
+    if min_interval is not None and since_published < min_interval:
+        _logger.info(f'Skipped publishing {entity_data_source}, published {since_published:.0f}s ago')
+        return False
+
+    is_changed = get_change_version(entity_data_source) != _published_versions.get(entity_data_source)
+    if not is_changed and (max_interval is None or since_published < max_interval):
+        _logger.info(f'Skipped publishing {entity_data_source}, unchanged since last publish')
+        return False
+
+    return True
@@ -0,0 +1,38 @@
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+
+
+class DedupCache(Generic[K]):
+    def __init__(self, max_size: int, ttl: float):
+        self._entries: OrderedDict[K, float] = OrderedDict()
+        self._lock = Lock()
+        self._max_size = max_size
+        self._ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def seen(self, key: K) -> bool:
+        # Records the key and returns whether it was already recorded within the last ttl seconds.
+        # The least recently seen keys are evicted once there are more than max_size.
+        now = time()
+        with self._lock:
+            seen_time = self._entries.get(key)
+            if seen_time is not None and now - seen_time < self._ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+
+            self._entries[key] = now
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+            self.misses += 1
+            return False
+
+    def size(self) -> int:
+        return len(self._entries)
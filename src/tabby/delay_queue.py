@@ -0,0 +1,85 @@
+from heapq import heappop, heappush
+from itertools import count
+from threading import Condition
+from time import time
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar('T')
+
+# How often to re-check a head item that is due but not ready, in case nobody calls notify().
+_NOT_READY_POLL_SECONDS = 1.0
+
+
+class DelayQueue(Generic[T]):
+    def __init__(self):
+        # Entries are [priority, sequence, first queued time, delay start, item]. They are ordered by priority and then
+        # sequence, which is unique, so the times can change in place.
+        self._heap: list[list[Any]] = []
+        self._entries: dict[int, list[Any]] = {}
+        self._condition = Condition()
+        self._sequence = count()
+
+    def put(self, priority: Any, item: T) -> None:
+        with self._condition:
+            now = time()
+            entry = [priority, next(self._sequence), now, now, item]
+            heappush(self._heap, entry)
+            self._entries[id(item)] = entry
+            self._condition.notify_all()
+
+    def touch(self, item: T) -> None:
+        # Restarts the delay of a queued item, e.g. after it changed. Does nothing if the item has left the queue.
+        with self._condition:
+            entry = self._entries.get(id(item))
+            if entry is not None:
+                entry[3] = time()
+
+    def notify(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+
+    def get(
+        self,
+        delay: float,
+        is_ready: Callable[[T], bool] = lambda _: True,
+        max_items: int | None = 1
+    ) -> list[T]:
+        # Items leave strictly in priority order. The head item blocks every item behind it
+        # until it has been queued for at least delay seconds and is_ready accepts it.
+        with self._condition:
+            while True:
+                timeout = None
+                if self._heap:
+                    _, _, _, delay_start, item = self._heap[0]
+                    remaining = delay_start + delay - time()
+                    if remaining > 0:
+                        timeout = remaining
+                    elif is_ready(item):
+                        return self._pop_ready(delay, is_ready, max_items)
+                    else:
+                        timeout = _NOT_READY_POLL_SECONDS
+
+                self._condition.wait(timeout)
+
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def oldest_age(self) -> float:
+        with self._condition:
+            if not self._heap:
+                return 0.0
+            return time() - min(queued_time for _, _, queued_time, _, _ in self._heap)
+
+    def _pop_ready(self, delay: float, is_ready: Callable[[T], bool], max_items: int | None) -> list[T]:
+        now = time()
+        items: list[T] = []
+        while self._heap and (max_items is None or len(items) < max_items):
+            _, _, _, delay_start, item = self._heap[0]
+            if now - delay_start < delay or not is_ready(item):
+                break
+
+            heappop(self._heap)
+            del self._entries[id(item)]
+            items.append(item)
+
+        return items
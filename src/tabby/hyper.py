@@ -1,11 +1,15 @@
 import atexit
+from dataclasses import dataclass, field
 from logging import getLogger
-from typing import Any, Iterable
+from threading import Lock
+from typing import Any, Iterable, Iterator
 
-from tableauhyperapi import HyperProcess, Connection, TableDefinition, SqlType
+from tableauhyperapi import HyperProcess, Connection, Name, TableDefinition, SqlType
 
 from .args import args
 from .request_schemas import Webhook, Change
+from .row_converter import RowConverter
+from .type_inference import SQL_TYPE_NAMES
 
 _logger = getLogger(__name__)
 
@@ -14,12 +18,72 @@ dbs: dict[str, Connection] | None = None
 
 entity_column_defs: dict[str, dict[str, SqlType]] = {}
 
+# Compiled row converters, along with the column defs they were compiled from.
+_row_converters: dict[str, tuple[dict[str, SqlType], RowConverter]] = {}
+
+_CONVERT_CHUNK_SIZE = 5000
+
+# Batched updates are staged here as text, and cast to each column's type when applied.
+_UPDATE_STAGING_TABLE = 'tabby_update_staging'
+
+# Hyper's SQL names for the SqlType tags that differ from them.
+_SQL_TYPE_CASTS = {'BIG_INT': 'BIGINT', 'SMALL_INT': 'SMALLINT', 'DOUBLE': 'DOUBLE PRECISION'}
+
+# Oldest change first, so a sync cut short by rally_get_limit can continue from the newest fetched record.
+_SYNC_ORDER = 'LastUpdateDate ASC'
+
+
+@dataclass
+class PublishDelta:
+    inserted: set[str] = field(default_factory=set)
+    updated: set[str] = field(default_factory=set)
+    deleted: set[str] = field(default_factory=set)
+
+    def entity_ids(self) -> set[str]:
+        return self.inserted | self.updated | self.deleted
+
+
+# Incremented whenever an entity's data changes, so publishing can skip entities that did not change.
+_change_versions: dict[str, int] = {}
+_change_versions_lock = Lock()
+
+
+@dataclass
+class _TableIndex:
+    table_def: TableDefinition
+    columns: dict[str, Name]
+    object_uuid: Name
+    object_ids: set[str]
+    # Value columns of the connection's temporary table that batched updates are staged in. 0 until it is created.
+    update_staging_width: int = 0
+
+
+# The table definition and the ObjectUUIDs of every row of each entity table, so webhooks need no catalog
+# lookups or existence queries. Maintained by the webhook write path, and dropped when a table is rewritten.
+_table_indexes: dict[str, _TableIndex] = {}
+_table_indexes_lock = Lock()
+
+# ObjectUUIDs changed since the last publish, when delta publishing. None means a full publish is required.
+_publish_deltas: dict[str, PublishDelta | None] = {}
+
+# Entities whose bulk load skipped a failed Rally page. They get no sync state, so the next sync loads them fully.
+_incomplete_loads: set[str] = set()
+_incomplete_loads_lock = Lock()
+
 
 def start_hyper() -> None:
     _init_all_connections()
 
-    if args.rally_refresh_on_start:
+    if args.rally_incremental_sync:
+        _sync_tables_with_rally_data()
+    elif args.rally_refresh_on_start:
         _create_tables_with_rally_data()
+    elif args.hyper_persist:
+        _load_column_defs()
+
+    for entity_name in args.rally_entities:
+        if dbs[entity_name].catalog.has_table(entity_name):
+            _get_table_index(entity_name)
 
 
 def is_open(data_source: str) -> bool:
@@ -33,7 +97,6 @@ def is_open(data_source: str) -> bool:
 
 def init_connection(data_source: str) -> None:
     from os import makedirs
-    from pathlib import PurePath
 
     from tableauhyperapi import CreateMode, Telemetry
 
@@ -49,9 +112,76 @@ def init_connection(data_source: str) -> None:
 
         dbs[data_source] = Connection(
             endpoint=_hyper_process.endpoint,
-            database=PurePath(args.tableau_datasource_dir, f'{data_source}.hyper'),
-            create_mode=CreateMode.CREATE_AND_REPLACE
+            database=_get_database_path(data_source),
+            create_mode=CreateMode.CREATE_IF_NOT_EXISTS if _is_persistent() else CreateMode.CREATE_AND_REPLACE
         )
+        _drop_table_index(data_source)
+
+        from .webhook_processer import notify_webhook_processor
+        notify_webhook_processor()
+
+
+def create_snapshot(data_source: str) -> str:
+    # Copy every table into a separate database through a second connection. The live connection stays open,
+    # and the copy only sees committed data, so it is a consistent point-in-time snapshot.
+    return _copy_to_snapshot(data_source, f'{data_source}.hyper')
+
+
+def create_delta_snapshot(data_source: str, entity_ids: set[str]) -> str:
+    # Like create_snapshot, but only with the current rows of the given objects,
+    # plus an ObjectUUIDs table listing every given object, including those that no longer exist.
+    return _copy_to_snapshot(data_source, f'{data_source}.delta.hyper', entity_ids)
+
+
+def _copy_to_snapshot(data_source: str, file_name: str, entity_ids: set[str] | None = None) -> str:
+    from os import makedirs
+    from pathlib import PurePath
+
+    from tableauhyperapi import Inserter, Nullability, SchemaName, TableName
+
+    snapshot_dir = PurePath(args.tableau_datasource_dir, 'snapshots')
+    makedirs(snapshot_dir, exist_ok=True)
+    snapshot_path = str(PurePath(snapshot_dir, file_name))
+
+    with Connection(endpoint=_hyper_process.endpoint) as connection:
+        connection.catalog.attach_database(_get_database_path(data_source), alias='live')
+        connection.catalog.drop_database_if_exists(snapshot_path)
+        connection.catalog.create_database(snapshot_path)
+        connection.catalog.attach_database(snapshot_path, alias='snapshot')
+
+        keys_table_name = TableName('snapshot', 'public', 'ObjectUUIDs')
+        if entity_ids is not None:
+            keys_table_def = TableDefinition(keys_table_name)
+            keys_table_def.add_column('ObjectUUID', SqlType.text(), Nullability.NOT_NULLABLE)
+            connection.catalog.create_table(keys_table_def)
+            with Inserter(connection, keys_table_def) as inserter:
+                inserter.add_rows([entity_id] for entity_id in entity_ids)
+                inserter.execute()
+
+        connection.execute_command('BEGIN TRANSACTION')
+        for table_name in connection.catalog.get_table_names(SchemaName('live', 'public')):
+            table_def = connection.catalog.get_table_definition(table_name)
+            snapshot_table_name = TableName('snapshot', 'public', table_name.name)
+            connection.catalog.create_table(TableDefinition(snapshot_table_name, table_def.columns))
+
+            query = f'SELECT * FROM {table_name}'
+            if entity_ids is not None:
+                object_uuid = table_def.get_column_by_name('ObjectUUID').name
+                query += f' WHERE {object_uuid} IN (SELECT {object_uuid} FROM {keys_table_name})'
+            connection.execute_command(f'INSERT INTO {snapshot_table_name} {query}')
+        connection.execute_command('COMMIT')
+
+    return snapshot_path
+
+
+def _get_database_path(data_source: str) -> str:
+    from pathlib import PurePath
+
+    return str(PurePath(args.tableau_datasource_dir, f'{data_source}.hyper'))
+
+
+def _is_persistent() -> bool:
+    return args.hyper_persist or args.rally_incremental_sync
 
 
 def close_connection(data_source: str):
@@ -75,11 +205,121 @@ def _close_all_connections():
 atexit.register(_close_all_connections)
 
 
+def get_change_version(data_source: str) -> int:
+    return _change_versions.get(data_source, 0)
+
+
+def take_publish_delta(data_source: str) -> PublishDelta | None:
+    # Returns the objects changed since the last call and starts tracking again. None means a full publish is required.
+    with _change_versions_lock:
+        delta = _publish_deltas.get(data_source, PublishDelta())
+        _publish_deltas[data_source] = PublishDelta()
+        return delta
+
+
+def restore_publish_delta(data_source: str, delta: PublishDelta | None) -> None:
+    # Puts back a delta that could not be published, merged with any changes made since it was taken.
+    with _change_versions_lock:
+        current_delta = _publish_deltas.get(data_source, PublishDelta())
+        if delta is None or current_delta is None:
+            _publish_deltas[data_source] = None
+            return
+
+        current_delta.inserted |= delta.inserted
+        current_delta.updated |= delta.updated
+        current_delta.deleted |= delta.deleted
+        _publish_deltas[data_source] = current_delta
+
+
+def _mark_changed(data_source: str, changed_ids: dict[str, Iterable[str]] | None = None) -> None:
+    # changed_ids maps Created/Updated/Recycled to the ObjectUUIDs they changed. None means any row may have changed.
+    with _change_versions_lock:
+        _change_versions[data_source] = _change_versions.get(data_source, 0) + 1
+
+        if not args.tableau_publish_delta:
+            return
+
+        delta = _publish_deltas.get(data_source, PublishDelta())
+        if changed_ids is None or delta is None:
+            _publish_deltas[data_source] = None
+            return
+
+        delta.inserted.update(changed_ids.get('Created', ()))
+        delta.updated.update(changed_ids.get('Updated', ()))
+        delta.deleted.update(changed_ids.get('Recycled', ()))
+        _publish_deltas[data_source] = delta
+
+
 def process_changes(webhook: Webhook) -> None:
+    from time import perf_counter
+
+    from .metrics import PROCESS_CHANGES_SECONDS
+
     entity_type = webhook.message.object_type
     entity_id = webhook.message.object_id
     action = webhook.message.action
 
+    start_time = perf_counter()
+    state, changes = _prepare_changes(webhook)
+    row_count = _process_changes(entity_type, entity_id, action, changes, state)
+    PROCESS_CHANGES_SECONDS.observe(entity_type, action, value=perf_counter() - start_time)
+    if row_count != 'ignored' and row_count > 0:
+        _mark_changed(entity_type, {action: [entity_id]})
+
+    _log_changes(webhook, changes, row_count)
+
+
+def process_changes_batch(entity_type: str, webhooks: list[Webhook]) -> None:
+    # Applies every webhook for one entity in a single transaction.
+    # Webhooks must already be sorted by transaction timestamp.
+    from time import perf_counter
+
+    from .metrics import PROCESS_CHANGES_BATCH_SECONDS, WEBHOOKS_APPLIED
+
+    db = dbs[entity_type]
+
+    start_time = perf_counter()
+    prepared = [(webhook, *_prepare_changes(webhook)) for webhook in webhooks]
+    try:
+        # Hyper cannot create tables in a transaction that has already changed data.
+        _ensure_update_staging(entity_type, max((len(changes) for _, _, changes in prepared), default=0))
+        db.execute_command('BEGIN TRANSACTION')
+        row_counts = _process_changes_batch(entity_type, prepared)
+        db.execute_command('COMMIT')
+        PROCESS_CHANGES_BATCH_SECONDS.observe(entity_type, value=perf_counter() - start_time)
+    except Exception as ex:
+        try:
+            db.execute_command('ROLLBACK')
+        except Exception:
+            pass
+
+        # The index may hold changes that were just rolled back.
+        _drop_table_index(entity_type)
+        _logger.error(f'Batch of {len(webhooks)} {entity_type} change(s) failed, applying individually: {ex}')
+        for webhook in webhooks:
+            try:
+                process_changes(webhook)
+            except Exception as ex:
+                WEBHOOKS_APPLIED.inc(entity_type, webhook.message.action, 'error')
+                _logger.error(str(ex))
+        return
+
+    changed_ids: dict[str, list[str]] = {}
+    for webhook, row_count in zip(webhooks, row_counts):
+        if row_count != 'ignored' and row_count > 0:
+            changed_ids.setdefault(webhook.message.action, []).append(webhook.message.object_id)
+
+    if changed_ids:
+        _mark_changed(entity_type, changed_ids)
+
+    for (webhook, _, changes), row_count in zip(prepared, row_counts):
+        _log_changes(webhook, changes, row_count)
+
+
+def _prepare_changes(webhook: Webhook) -> tuple[list[Any], list[Change]]:
+    entity_type = webhook.message.object_type
+    action = webhook.message.action
+
     global entity_column_defs
     attrs = entity_column_defs.get(entity_type, {})
 
@@ -87,16 +327,25 @@ def process_changes(webhook: Webhook) -> None:
     changes = []
     if action == 'Created':
         row_dict = {attr.name: attr.value for attr in webhook.message.state.values()}
-        row_data = [kv for kv in sorted(
-            [(k, row_dict.get(k)) for k in attrs.keys()],
-            key=lambda kv: _sanitize_column_name(kv[0])
-        )]
-
-        state = _process_row_values(entity_type, row_data)
+        state = _get_row_converter(entity_type)(row_dict)
     elif action == 'Updated':
         changes = [change for change in webhook.message.changes.values() if not any(attrs) or change.name in attrs]
 
-    row_count = _process_changes(entity_type, entity_id, action, changes, state)
+    return state, changes
+
+
+def _log_changes(webhook: Webhook, changes: list[Change], row_count: int | str) -> None:
+    from time import time
+
+    from .metrics import WEBHOOK_LAG, WEBHOOKS_APPLIED
+
+    entity_type = webhook.message.object_type
+    entity_id = webhook.message.object_id
+    action = webhook.message.action
+
+    # Rally transaction timestamps are in milliseconds.
+    WEBHOOK_LAG.observe(entity_type, value=time() - webhook.message.transaction.timestamp / 1000)
+    WEBHOOKS_APPLIED.inc(entity_type, action, 'ignored' if row_count == 'ignored' else 'applied' if row_count > 0 else 'failed')
 
     change_names = ', '.join([change.display_name for change in changes])
     update_description = f' with {len(changes)} change(s) [{change_names}]' if action == 'Updated' else ''
@@ -122,74 +371,258 @@ def _process_changes(
     from tableauhyperapi import Inserter, escape_string_literal
 
     db = dbs[entity_type]
-    table_def = db.catalog.get_table_definition(entity_type)
+    table_index = _get_table_index(entity_type)
+    table_def = table_index.table_def
+    object_ids = table_index.object_ids
 
     row_count = 0
     if action == 'Created':
-        num_entities = db.execute_scalar_query(
-            query=f'SELECT COUNT(1) '
-                  f'FROM {table_def.table_name} '
-                  f'WHERE {table_def.get_column_by_name('ObjectUUID').name} = {escape_string_literal(entity_id)}'
-        )
-
-        is_already_deleted = num_entities > 0
-        if is_already_deleted:
+        if entity_id in object_ids:
             return 'ignored'
 
         with Inserter(db, table_def) as inserter:
             inserter.add_row(state)
             inserter.execute()
             row_count = 1
+        object_ids.add(entity_id)
 
     elif action == 'Updated':
-        column_assignments = []
-        for change in changes:
-            column_name_str = _sanitize_column_name(change.name)
-
-            column = table_def.get_column_by_name(column_name_str)
-            if column is None:
-                _logger.warning(f'Ignoring change to column {column_name_str}')
-                continue
+        column_assignments = _column_assignments(table_index.columns, changes)
 
-            column_name = column.name
-            if change.value is None and change.old_value is None:
-                added = len(change.added) if change.added is not None else 0
-                removed = len(change.removed) if change.removed is not None else 0
-                net_change = added - removed
-                operator = '+' if net_change >= 0 else '-'
-
-                if net_change != 0:
-                    column_assignments.append(f'{column_name} = {column_name} {operator} {abs(net_change)}')
-            else:
-                value = _process_change_value(change.value, change.type)
-                column_assignments.append(f'{column_name} = {value}')
-
-        if any(column_assignments):
+        if any(column_assignments) and entity_id in object_ids:
             row_count = db.execute_command(
                 command=f'UPDATE {table_def.table_name} '
                         f'SET {', '.join(column_assignments)} '
-                        f'WHERE {table_def.get_column_by_name('ObjectUUID').name} = {escape_string_literal(entity_id)}'
+                        f'WHERE {table_index.object_uuid} = {escape_string_literal(entity_id)}'
             )
 
     elif action == 'Recycled':
-        num_entities = db.execute_scalar_query(
-            query=f'SELECT COUNT(1) '
-                  f'FROM {table_def.table_name} '
-                  f'WHERE {table_def.get_column_by_name('ObjectUUID').name} = {escape_string_literal(entity_id)}'
-        )
-
-        is_already_deleted = num_entities == 0
-        if is_already_deleted:
+        if entity_id not in object_ids:
             return 'ignored'
 
         row_count = db.execute_command(
             command=f'DELETE FROM {table_def.table_name} '
-                    f'WHERE {table_def.get_column_by_name('ObjectUUID').name} = {escape_string_literal(entity_id)}'
+                    f'WHERE {table_index.object_uuid} = {escape_string_literal(entity_id)}'
         )
+        object_ids.discard(entity_id)
 
     return row_count
 
 
+def _process_changes_batch(
+    entity_type: str,
+    prepared: list[tuple[Webhook, list[Any], list[Change]]]
+) -> list[int | str]:
+    from tableauhyperapi import Inserter, escape_string_literal
+
+    db = dbs[entity_type]
+    table_index = _get_table_index(entity_type)
+    table_def = table_index.table_def
+    object_uuid = table_index.object_uuid
+
+    row_counts: list[int | str] = [0] * len(prepared)
+
+    # Pending set-based operations. Operations on different objects commute, so they can be grouped freely.
+    # Operations on the same object must keep their order, so pending work is flushed on conflicting actions.
+    # Updates are grouped by the columns they set and whether each change is relative, and staged per object.
+    inserts: dict[str, int] = {}
+    deletes: dict[str, int] = {}
+    updates: list[tuple[tuple[tuple[str, bool], ...], dict[str, tuple[list[int], list[str | None]]]]] = []
+    last_update_index: dict[str, int] = {}
+
+    def id_list(entity_ids: Iterable[str]) -> str:
+        return ', '.join(escape_string_literal(entity_id) for entity_id in entity_ids)
+
+    def flush() -> None:
+        entity_ids = set(inserts) | set(deletes) | set(last_update_index)
+        if not entity_ids:
+            return
+
+        existing_ids = entity_ids & table_index.object_ids
+
+        new_ids = [entity_id for entity_id in inserts if entity_id not in existing_ids]
+        if any(new_ids):
+            with Inserter(db, table_def) as inserter:
+                inserter.add_rows(prepared[inserts[entity_id]][1] for entity_id in new_ids)
+                inserter.execute()
+            table_index.object_ids.update(new_ids)
+        for entity_id, index in inserts.items():
+            row_counts[index] = 'ignored' if entity_id in existing_ids else 1
+
+        deleted_ids = [entity_id for entity_id in deletes if entity_id in existing_ids]
+        if any(deleted_ids):
+            db.execute_command(
+                command=f'DELETE FROM {table_def.table_name} WHERE {object_uuid} IN ({id_list(deleted_ids)})'
+            )
+            table_index.object_ids.difference_update(deleted_ids)
+        for entity_id, index in deletes.items():
+            row_counts[index] = 1 if entity_id in existing_ids else 'ignored'
+
+        for signature, staged_by_id in updates:
+            staged_rows = [
+                (entity_id, values) for entity_id, (_, values) in staged_by_id.items() if entity_id in existing_ids
+            ]
+            if any(staged_rows):
+                _apply_staged_updates(entity_type, table_index, signature, staged_rows)
+            for entity_id, (indexes, _) in staged_by_id.items():
+                for index in indexes:
+                    row_counts[index] = 1 if entity_id in existing_ids else 0
+
+        inserts.clear()
+        deletes.clear()
+        updates.clear()
+        last_update_index.clear()
+
+    for index, (webhook, state, changes) in enumerate(prepared):
+        entity_id = webhook.message.object_id
+        action = webhook.message.action
+
+        if action == 'Created':
+            if entity_id in inserts or entity_id in deletes or entity_id in last_update_index:
+                flush()
+            inserts[entity_id] = index
+
+        elif action == 'Updated':
+            column_changes = _column_changes(table_index.columns, changes)
+            if not any(column_changes):
+                continue
+
+            if entity_id in inserts or entity_id in deletes:
+                flush()
+
+            signature = tuple((column_name.unescaped, net_change is not None) for column_name, _, net_change in column_changes)
+            values = [
+                _change_value_text(change.value, change.type) if net_change is None else str(net_change)
+                for _, change, net_change in column_changes
+            ]
+
+            # Join the latest group with the same columns, unless this object was updated after it.
+            update_index = next(
+                (i for i in range(len(updates) - 1, -1, -1) if updates[i][0] == signature),
+                None
+            )
+            if update_index is None or update_index < last_update_index.get(entity_id, -1):
+                updates.append((signature, {}))
+                update_index = len(updates) - 1
+            elif entity_id in updates[update_index][1] and any(is_relative for _, is_relative in signature):
+                # Relative collection counts must be applied twice, which a single UPDATE ... FROM cannot do.
+                updates.append((signature, {}))
+                update_index = len(updates) - 1
+
+            # A later update of the same columns replaces the staged values.
+            indexes, _ = updates[update_index][1].get(entity_id, ([], None))
+            indexes.append(index)
+            updates[update_index][1][entity_id] = (indexes, values)
+            last_update_index[entity_id] = update_index
+
+        elif action == 'Recycled':
+            if entity_id in inserts or entity_id in deletes or entity_id in last_update_index:
+                flush()
+            deletes[entity_id] = index
+
+    flush()
+    return row_counts
+
+
+def _column_assignments(columns: dict[str, Name], changes: list[Change]) -> list[str]:
+    column_assignments = []
+    for column_name, change, net_change in _column_changes(columns, changes):
+        if net_change is None:
+            value = _process_change_value(change.value, change.type)
+            column_assignments.append(f'{column_name} = {value}')
+        else:
+            operator = '+' if net_change >= 0 else '-'
+            column_assignments.append(f'{column_name} = {column_name} {operator} {abs(net_change)}')
+
+    return column_assignments
+
+
+def _column_changes(columns: dict[str, Name], changes: list[Change]) -> list[tuple[Name, Change, int | None]]:
+    # The column each change sets, and the net change of relative collection counts. None for changed values.
+    column_changes = []
+    for change in changes:
+        column_name_str = _sanitize_column_name(change.name)
+
+        column_name = columns.get(column_name_str)
+        if column_name is None:
+            _logger.warning(f'Ignoring change to column {column_name_str}')
+            continue
+
+        if change.value is None and change.old_value is None:
+            added = len(change.added) if change.added is not None else 0
+            removed = len(change.removed) if change.removed is not None else 0
+            net_change = added - removed
+
+            if net_change != 0:
+                column_changes.append((column_name, change, net_change))
+        else:
+            column_changes.append((column_name, change, None))
+
+    return column_changes
+
+
+def _ensure_update_staging(entity_name: str, width: int) -> None:
+    from tableauhyperapi import Persistence
+
+    table_index = _get_table_index(entity_name)
+    if width <= table_index.update_staging_width:
+        return
+
+    db = dbs[entity_name]
+    staging_def = TableDefinition(_UPDATE_STAGING_TABLE, persistence=Persistence.TEMPORARY)
+    staging_def.add_column('ObjectUUID', SqlType.text())
+    for i in range(width):
+        staging_def.add_column(f'v{i}', SqlType.text())
+
+    db.execute_command(f'DROP TABLE IF EXISTS {staging_def.table_name}')
+    db.catalog.create_table(staging_def)
+    table_index.update_staging_width = width
+
+
+def _apply_staged_updates(
+    entity_name: str,
+    table_index: _TableIndex,
+    signature: tuple[tuple[str, bool], ...],
+    staged_rows: list[tuple[str, list[str | None]]]
+) -> None:
+    from tableauhyperapi import Inserter, TableName
+
+    # Stages the values of every object with one Inserter, then sets them all with one UPDATE ... FROM.
+    db = dbs[entity_name]
+    table_def = table_index.table_def
+    staging_table_name = TableName(_UPDATE_STAGING_TABLE)
+    width = table_index.update_staging_width
+
+    db.execute_command(f'DELETE FROM {staging_table_name}')
+    with Inserter(db, staging_table_name, ['ObjectUUID', *[f'v{i}' for i in range(width)]]) as inserter:
+        inserter.add_rows([entity_id, *values, *[None] * (width - len(values))] for entity_id, values in staged_rows)
+        inserter.execute()
+
+    assignments = []
+    for i, (column_name_str, is_relative) in enumerate(signature):
+        column_name = table_index.columns[column_name_str]
+        column_type = str(table_def.get_column_by_name(column_name_str).type)
+        value = f'CAST(s."v{i}" AS {_SQL_TYPE_CASTS.get(column_type, column_type)})'
+        assignments.append(f'{column_name} = t.{column_name} + {value}' if is_relative else f'{column_name} = {value}')
+
+    db.execute_command(
+        command=f'UPDATE {table_def.table_name} AS t SET {', '.join(assignments)} '
+                f'FROM {staging_table_name} AS s WHERE t.{table_index.object_uuid} = s."ObjectUUID"'
+    )
+
+
+def _change_value_text(value: Any | None, change_type: str) -> str | None:
+    # Like _process_change_value, but the text that Hyper casts to the column type rather than a SQL literal.
+    if isinstance(value, dict):
+        return _change_value_text(value.get('value'), change_type)
+    if value is None:
+        return None
+    if not isinstance(value, (str, int, float)):
+        _logger.warning(f'Unexpected column type used during update: {change_type}/{type(value)}')
+
+    return str(value)
+
+
 def _process_change_value(value: Any | None, change_type: str) -> Any:
     from tableauhyperapi import escape_string_literal
 
@@ -208,68 +641,298 @@ def _process_change_value(value: Any | None, change_type: str) -> Any:
     return value
 
 
-def _create_tables_with_rally_data() -> None:
+def _sync_tables_with_rally_data() -> None:
     from concurrent.futures import ThreadPoolExecutor
     from concurrent.futures import as_completed
 
-    from tableauhyperapi import Inserter
+    global entity_column_defs
 
-    with ThreadPoolExecutor(max_workers=1 if args.rally_get_limit > 100 else None) as executor:
-        future_to_entities = {executor.submit(_get_all_entities, entity): entity for entity in args.rally_entities}
+    # Entities without a previous sync or table need a full load. The rest only get records changed since their watermark.
+    full_entities: list[str] = []
+    sync_states: dict[str, dict[str, Any]] = {}
+    for entity_name in args.rally_entities:
+        sync_state = _load_sync_state(entity_name)
+        if sync_state is None or not dbs[entity_name].catalog.has_table(entity_name):
+            full_entities.append(entity_name)
+        else:
+            sync_states[entity_name] = sync_state
 
-    rally_entities_dict: dict[str, list[dict[str, Any]]] = {}
-    for future in as_completed(future_to_entities):
-        entity_name, entities = future.result()
-        rally_entities_dict[entity_name] = entities
+    if any(full_entities):
+        _logger.info(f'Fully loading {', '.join(full_entities)} from Rally')
+        _create_tables_with_rally_data(full_entities)
 
-    # Build dynamic table defs and all rows to be inserted.
-    # If a column value is null for all records, exclude from def.
+    for entity_name, sync_state in sync_states.items():
+        entity_column_defs[entity_name] = sync_state['columns']
 
-    # First pass. Get all columns that will hold at least one non-None value for at least one row.
-    with ThreadPoolExecutor() as executor:
-        future_to_entity = {executor.submit(_process_entity, entity_name, entities):
-                            entity_name for entity_name, entities in rally_entities_dict.items()}
+    with ThreadPoolExecutor(max_workers=_get_entity_fetch_workers()) as executor:
+        future_to_entity = {executor.submit(_sync_entity, entity_name, sync_state['last_update_date']):
+                            entity_name for entity_name, sync_state in sync_states.items()}
 
-    global entity_column_defs
     for future in as_completed(future_to_entity):
-        entity_name, entity_columns = future.result()
-        entity_column_defs[entity_name] = entity_columns
+        future.result()
 
-    # Build table defs and column/attribute sets from entity_column_defs.
-    with ThreadPoolExecutor() as executor:
-        future_to_table_def = {executor.submit(_create_table_def, entity_name, entity_columns):
-                               entity_name for entity_name, entity_columns in entity_column_defs.items()}
 
-    table_defs: list[TableDefinition] = []
-    for future in as_completed(future_to_table_def):
-        table_defs.append(future.result())
+def _sync_entity(entity_name: str, last_update_date: str | None) -> None:
+    from .rally import IncompleteFetchError, get
 
-    # Create tables with table defs.
-    with ThreadPoolExecutor() as executor:
-        executor.map(_create_table, table_defs)
+    # Records come oldest change first. When rally_get_limit cuts a window short, every record not fetched yet
+    # changed at or after the newest fetched one, so the next window starts there.
+    while True:
+        query = f'LastUpdateDate >= "{last_update_date}"' if last_update_date else None
 
-    # Second pass. Build rows to be inserted.
-    def process_rally_entities(entity_key: str, rally_entities: list[dict[str, Any]]) -> (str, list[list[Any]]):
-        entity_data: list[list[Any]] = []
-        for row_dict in rally_entities:
-            row_data = [kv for kv in sorted(
-                [(k, row_dict.get(k)) for k in entity_column_defs[entity_key]],
-                key=lambda kv: _sanitize_column_name(kv[0])
-            )]
+        _logger.info(f'Getting {entity_name} entities changed since {last_update_date} from Rally...')
+        errors: list[Exception] = []
+        try:
+            rally_entities = get(entity_name, query=query, order=_SYNC_ORDER, errors=errors)
+        except Exception as ex:
+            rally_entities = []
+            errors.append(ex)
+
+        # What was fetched is upserted even when pages are missing, it is still the current data.
+        row_count = _upsert_rally_entities(entity_name, rally_entities)
+        _logger.info(f'Upserted {row_count} changed {entity_name} record(s) into hyper database')
+
+        failures = [error for error in errors if not isinstance(error, IncompleteFetchError)]
+        if any(failures):
+            # Only a complete window may move the watermark past the missing records.
+            _logger.error(f'Failed to get every changed {entity_name} entity from Rally, keeping the last watermark: {failures[0]}')
+            return
+
+        last_update_dates = [str(row_dict['LastUpdateDate']) for row_dict in rally_entities if row_dict.get('LastUpdateDate')]
+        next_update_date = max([last_update_date, *last_update_dates], default=None, key=lambda date: date or '')
+        _save_sync_state(entity_name, next_update_date)
+
+        if not any(errors):
+            return
+
+        if next_update_date == last_update_date:
+            _logger.error(
+                f'More than {args.rally_get_limit} {entity_name} entities changed at {last_update_date}, '
+                f'raise --rally_get_limit to sync past them'
+            )
+            return
+
+        last_update_date = next_update_date
 
-            row_values = _process_row_values(entity_key, row_data)
-            entity_data.append(row_values)
 
-        return entity_key, entity_data
+def _upsert_rally_entities(entity_name: str, rally_entities: list[dict[str, Any]]) -> int:
+    from tableauhyperapi import Inserter, escape_string_literal
+
+    db = dbs[entity_name]
+    table_def = db.catalog.get_table_definition(entity_name)
+    object_uuid = table_def.get_column_by_name('ObjectUUID').name
+
+    _, rows = _process_rally_entities(entity_name, rally_entities)
+    entity_ids = [row_dict['ObjectUUID'] for row_dict in rally_entities if row_dict.get('ObjectUUID')]
+    if any(entity_ids):
+        db.execute_command('BEGIN TRANSACTION')
+        try:
+            db.execute_command(
+                command=f'DELETE FROM {table_def.table_name} '
+                        f'WHERE {object_uuid} IN ({', '.join(escape_string_literal(entity_id) for entity_id in entity_ids)})'
+            )
+            with Inserter(db, table_def) as inserter:
+                inserter.add_rows(rows)
+                inserter.execute()
+            db.execute_command('COMMIT')
+        except Exception:
+            db.execute_command('ROLLBACK')
+            raise
+        finally:
+            _drop_table_index(entity_name)
+
+    if any(rows):
+        _mark_changed(entity_name)
+
+    return len(rows)
+
+
+def _load_column_defs() -> None:
+    global entity_column_defs
+    for entity_name in args.rally_entities:
+        db = dbs[entity_name]
+        if not db.catalog.has_table(entity_name):
+            _logger.warning(f'No existing {entity_name} table, use --rally_refresh_on_start to load it from Rally')
+            continue
+
+        sync_state = _load_sync_state(entity_name)
+        if sync_state is not None:
+            entity_column_defs[entity_name] = sync_state['columns']
+        else:
+            # Without a sidecar the original Rally names of custom (c_) fields cannot be recovered.
+            table_def = db.catalog.get_table_definition(entity_name)
+            entity_column_defs[entity_name] = {column.name.unescaped: column.type for column in table_def.columns}
+            _logger.warning(f'Rebuilt {entity_name} columns from the hyper catalog, custom field webhooks may be ignored')
+
+        _logger.info(f'Reopened the {entity_name} table with {len(entity_column_defs[entity_name])} column(s)')
+
+
+def _save_sync_states(entity_names: list[str]) -> None:
+    if not _is_persistent():
+        return
+
+    from pathlib import Path
+
+    for entity_name in entity_names:
+        with _incomplete_loads_lock:
+            is_incomplete = entity_name in _incomplete_loads
+            _incomplete_loads.discard(entity_name)
+
+        if is_incomplete:
+            # The table's newest LastUpdateDate says nothing about the records on the pages that failed.
+            Path(args.tableau_datasource_dir, f'{entity_name}.json').unlink(missing_ok=True)
+            _logger.warning(f'Saved no sync state for {entity_name}, its load skipped failed Rally pages')
+        elif entity_name in entity_column_defs:
+            _save_sync_state(entity_name, _get_max_last_update_date(entity_name))
+
+
+def _record_load_errors(entity_name: str, errors: list[Exception]) -> None:
+    from .rally import IncompleteFetchError
+
+    # rally_get_limit caps a bulk load on purpose, only failed pages make it incomplete.
+    if any(not isinstance(error, IncompleteFetchError) for error in errors):
+        with _incomplete_loads_lock:
+            _incomplete_loads.add(entity_name)
+
+
+def _load_sync_state(entity_name: str) -> dict[str, Any] | None:
+    from json import load
+    from pathlib import Path
+
+    path = Path(args.tableau_datasource_dir, f'{entity_name}.json')
+    if not path.exists():
+        return None
+
+    try:
+        with open(path) as file:
+            sync_state = load(file)
+
+        return {
+            'last_update_date': sync_state.get('last_update_date'),
+            'columns': {column_name: SQL_TYPE_NAMES[type_name] for column_name, type_name in sync_state['columns'].items()}
+        }
+    except Exception as ex:
+        _logger.warning(f'Ignoring unreadable sync state {path}: {ex}')
+        return None
+
+
+def _save_sync_state(entity_name: str, last_update_date: str | None) -> None:
+    from json import dump
+    from os import replace
+    from pathlib import Path
+
+    type_names = {sql_type: type_name for type_name, sql_type in SQL_TYPE_NAMES.items()}
+    sync_state = {
+        'last_update_date': last_update_date,
+        'columns': {column_name: type_names[sql_type] for column_name, sql_type in entity_column_defs[entity_name].items()}
+    }
 
-    with ThreadPoolExecutor() as executor:
-        future_to_entity_rows = {executor.submit(process_rally_entities, entity_name, rally_entities):
-                                 entity_name for entity_name, rally_entities in rally_entities_dict.items()}
+    path = Path(args.tableau_datasource_dir, f'{entity_name}.json')
+    with open(f'{path}.tmp', 'w') as file:
+        dump(sync_state, file, indent=2)
+    replace(f'{path}.tmp', path)
 
-    table_rows_to_add: dict[str, list[list[Any]]] = {}
-    for future in as_completed(future_to_entity_rows):
-        entity_name, rows_to_add = future.result()
-        table_rows_to_add[entity_name] = rows_to_add
+
+def _get_max_last_update_date(entity_name: str) -> str | None:
+    db = dbs[entity_name]
+    table_def = db.catalog.get_table_definition(entity_name)
+    column = table_def.get_column_by_name('LastUpdateDate')
+    if column is None:
+        return None
+
+    last_update_date = db.execute_scalar_query(query=f'SELECT MAX({column.name}) FROM {table_def.table_name}')
+    if last_update_date is None:
+        return None
+
+    last_update_date = last_update_date.to_datetime()
+    return f'{last_update_date.strftime('%Y-%m-%dT%H:%M:%S')}.{last_update_date.microsecond // 1000:03d}Z'
+
+
+def _create_tables_with_rally_data(entity_names: list[str] | None = None) -> None:
+    from .profiler import BULK_LOAD, finish_profile, start_profile
+
+    start_profile(BULK_LOAD)
+    try:
+        _load_tables_with_rally_data(entity_names or args.rally_entities)
+    finally:
+        finish_profile(BULK_LOAD)
+
+
+def _load_tables_with_rally_data(entity_names: list[str]) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import as_completed
+
+    from tableauhyperapi import Inserter
+
+    from .metrics import time_bulk_load_phase
+    from .profiler import BULK_LOAD, profile_call
+
+    if args.rally_stream_load:
+        # Fetching, converting and inserting overlap when streaming, so they are timed as one phase.
+        with time_bulk_load_phase('stream'):
+            _stream_tables_with_rally_data(entity_names)
+        _save_sync_states(entity_names)
+        return
+
+    with time_bulk_load_phase('fetch'):
+        with ThreadPoolExecutor(max_workers=_get_entity_fetch_workers()) as executor:
+            future_to_entities = {executor.submit(profile_call, BULK_LOAD, 'fetch', entity, _get_all_entities, entity):
+                                  entity for entity in entity_names}
+
+        rally_entities_dict: dict[str, list[dict[str, Any]]] = {}
+        for future in as_completed(future_to_entities):
+            entity_name, entities = future.result()
+            rally_entities_dict[entity_name] = entities
+
+    # Build dynamic table defs and all rows to be inserted.
+    # If a column value is null for all records, exclude from def.
+
+    # First pass. Get all columns that will hold at least one non-None value for at least one row.
+    with time_bulk_load_phase('infer'):
+        with ThreadPoolExecutor() as executor:
+            future_to_entity = {executor.submit(profile_call, BULK_LOAD, 'infer', entity_name,
+                                                _process_entity, entity_name, entities):
+                                entity_name for entity_name, entities in rally_entities_dict.items()}
+
+        global entity_column_defs
+        for future in as_completed(future_to_entity):
+            entity_name, entity_columns = future.result()
+            entity_column_defs[entity_name] = entity_columns
+
+    # Build table defs and column/attribute sets from entity_column_defs.
+    with time_bulk_load_phase('create'):
+        with ThreadPoolExecutor() as executor:
+            future_to_table_def = {executor.submit(profile_call, BULK_LOAD, 'create', entity_name,
+                                                   _create_table_def, entity_name, entity_column_defs[entity_name]):
+                                   entity_name for entity_name in rally_entities_dict}
+
+        table_defs: list[TableDefinition] = []
+        for future in as_completed(future_to_table_def):
+            table_defs.append(future.result())
+
+        # Create tables with table defs.
+        with ThreadPoolExecutor() as executor:
+            for table_def in table_defs:
+                executor.submit(profile_call, BULK_LOAD, 'create', table_def.table_name.name.unescaped, _create_table, table_def)
+
+    if args.hyper_convert_processes > 0:
+        # Chunks are inserted while others are still converting, so they are timed as one phase.
+        with time_bulk_load_phase('convert_insert'):
+            _insert_rows_with_process_pool(table_defs, rally_entities_dict)
+        _save_sync_states(entity_names)
+        return
+
+    # Second pass. Build rows to be inserted.
+    with time_bulk_load_phase('convert'):
+        with ThreadPoolExecutor() as executor:
+            future_to_entity_rows = {executor.submit(profile_call, BULK_LOAD, 'convert', entity_name,
+                                                     _process_rally_entities, entity_name, rally_entities):
+                                     entity_name for entity_name, rally_entities in rally_entities_dict.items()}
+
+        table_rows_to_add: dict[str, list[list[Any]]] = {}
+        for future in as_completed(future_to_entity_rows):
+            entity_name, rows_to_add = future.result()
+            table_rows_to_add[entity_name] = rows_to_add
 
     # Insert rows into tables.
     def insert_rows_to_table(table_def):
@@ -279,64 +942,185 @@ def _create_tables_with_rally_data() -> None:
             inserter.execute()
 
         num_entities = dbs[table_name].execute_scalar_query(query=f'SELECT COUNT(1) from {table_def.table_name}')
+        _mark_changed(table_name)
         _logger.info(f'Inserted {num_entities} {table_name} record(s) into hyper database')
 
-    with ThreadPoolExecutor() as executor:
-        future_to_table_def = {executor.submit(insert_rows_to_table, table_def): table_def for table_def in table_defs}
+    with time_bulk_load_phase('insert'):
+        with ThreadPoolExecutor() as executor:
+            future_to_table_def = {executor.submit(profile_call, BULK_LOAD, 'insert', table_def.table_name.name.unescaped,
+                                                   insert_rows_to_table, table_def): table_def for table_def in table_defs}
+
+        for future in as_completed(future_to_table_def):
+            future.result()
 
-    for future in as_completed(future_to_table_def):
+    _save_sync_states(entity_names)
+
+
+def _insert_rows_with_process_pool(
+    table_defs: list[TableDefinition],
+    rally_entities_dict: dict[str, list[dict[str, Any]]]
+) -> None:
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from multiprocessing import get_context
+
+    from .profiler import BULK_LOAD, profile_call
+
+    # Row conversion is pure Python, so threads serialize on the GIL. Convert chunks of plain dicts in worker
+    # processes instead, and insert each converted chunk as soon as it comes back.
+    # Spawn avoids forking a process that is running threads and a hyper connection.
+    with ProcessPoolExecutor(max_workers=args.hyper_convert_processes, mp_context=get_context('spawn')) as process_pool:
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(profile_call, BULK_LOAD, 'convert_insert', table_def.table_name.name.unescaped,
+                                       _insert_entity_rows_with_process_pool, process_pool, table_def, rally_entities_dict)
+                       for table_def in table_defs]
+
+        for future in futures:
+            future.result()
+
+
+def _insert_entity_rows_with_process_pool(process_pool, table_def: TableDefinition, rally_entities_dict) -> None:
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    from tableauhyperapi import Inserter
+
+    from .row_converter import convert_plain_rows, pickle_plain_rows
+
+    table_name = table_def.table_name.name.unescaped
+    rally_entities = rally_entities_dict[table_name]
+
+    type_names = {sql_type: type_name for type_name, sql_type in SQL_TYPE_NAMES.items()}
+    entity_columns = entity_column_defs[table_name]
+    columns = [(column_name, type_names[entity_columns[column_name]])
+               for column_name in sorted(entity_columns, key=_sanitize_column_name)]
+    column_names = [column_name for column_name, _ in columns]
+
+    starts = iter(range(0, len(rally_entities), _CONVERT_CHUNK_SIZE))
+    pending = set()
+    with Inserter(dbs[table_name], table_def) as inserter:
+        while True:
+            # Keep enough chunks of this entity in flight to keep every worker busy, but no more, to bound memory.
+            while len(pending) < 2 * args.hyper_convert_processes:
+                start = next(starts, None)
+                if start is None:
+                    break
+                pickled_rows = pickle_plain_rows(rally_entities[start:start + _CONVERT_CHUNK_SIZE], column_names)
+                pending.add(process_pool.submit(convert_plain_rows, columns, pickled_rows))
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                inserter.add_rows(future.result())
+        inserter.execute()
+
+    num_entities = dbs[table_name].execute_scalar_query(query=f'SELECT COUNT(1) from {table_def.table_name}')
+    _mark_changed(table_name)
+    _logger.info(f'Inserted {num_entities} {table_name} record(s) into hyper database')
+
+
+def _stream_tables_with_rally_data(entity_names: list[str]) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import as_completed
+
+    from .profiler import BULK_LOAD, profile_call
+
+    with ThreadPoolExecutor(max_workers=_get_entity_fetch_workers()) as executor:
+        future_to_entity = {executor.submit(profile_call, BULK_LOAD, 'stream', entity_name, _stream_entity, entity_name):
+                            entity_name for entity_name in entity_names}
+
+    for future in as_completed(future_to_entity):
         future.result()
 
 
-def _get_all_entities(entity_name: str) -> tuple[str, list[dict[str, Any]]]:
-    from .rally import get
+def _stream_entity(entity_name: str) -> None:
+    from itertools import chain
 
-    _logger.info(f'Getting {entity_name} entities from Rally...')
-    return entity_name, get(entity_name)
+    from tableauhyperapi import Inserter
 
+    from .rally import get_pages
 
-def _process_entity(entity_name, rally_entities):
-    from datetime import datetime
+    _logger.info(f'Streaming {entity_name} entities from Rally...')
+    errors: list[Exception] = []
+    pages = get_pages(entity_name, errors=errors)
 
-    from pyral.entity import Persistable
-    from tableauhyperapi import SqlType
+    # Discover columns from a bounded sample of the first pages.
+    # Columns that only hold values after the sample are not included in the table.
+    sample_pages: list[list[dict[str, Any]]] = []
+    sample_size = 0
+    for page in pages:
+        sample_pages.append(page)
+        sample_size += len(page)
+        if sample_size >= args.rally_stream_sample_size:
+            break
 
-    entity_columns = {}
-    for row_dict in rally_entities:
-        if not row_dict or not any(row_dict):
-            continue
+    _, entity_columns = _process_entity(entity_name, chain.from_iterable(sample_pages))
 
-        for column_name, column_value in row_dict.items():
-            if column_value is None or str(column_name) == 'oid' or str(column_name).startswith('_'):
-                continue
+    global entity_column_defs
+    entity_column_defs[entity_name] = entity_columns
+
+    table_def = _create_table_def(entity_name, entity_columns)
+    _create_table(table_def)
+
+    def all_pages() -> Iterator[list[dict[str, Any]]]:
+        while sample_pages:
+            yield sample_pages.pop(0)
+        yield from pages
+
+    # Convert and insert page by page, so only a few pages are held in memory at once.
+    with Inserter(dbs[entity_name], table_def) as inserter:
+        for page in all_pages():
+            _, rows = _process_rally_entities(entity_name, page)
+            inserter.add_rows(rows)
+        inserter.execute()
+    _record_load_errors(entity_name, errors)
+
+    num_entities = dbs[entity_name].execute_scalar_query(query=f'SELECT COUNT(1) from {table_def.table_name}')
+    _mark_changed(entity_name)
+    _logger.info(f'Inserted {num_entities} {entity_name} record(s) into hyper database')
+
+
+def _process_rally_entities(entity_key: str, rally_entities: list[dict[str, Any]]) -> (str, list[list[Any]]):
+    convert_row = _get_row_converter(entity_key)
+    return entity_key, [convert_row(row_dict) for row_dict in rally_entities]
+
+
+def _get_row_converter(entity_name: str) -> RowConverter:
+    from .row_converter import compile_row_converter
+
+    # Column defs are always replaced rather than mutated, so identity tells whether the converter is current.
+    global entity_column_defs, _row_converters
+    entity_columns = entity_column_defs.get(entity_name, {})
+    cached = _row_converters.get(entity_name)
+    if cached is None or cached[0] is not entity_columns:
+        columns = [(column_name, entity_columns[column_name])
+                   for column_name in sorted(entity_columns, key=_sanitize_column_name)]
+        cached = (entity_columns, compile_row_converter(columns))
+        _row_converters[entity_name] = cached
+
+    return cached[1]
+
+
+def _get_entity_fetch_workers() -> int | None:
+    # Large sequential gets run one entity at a time.
+    # The concurrent page fetcher shares one capped pool across entities, so entities can run in parallel.
+    return None if args.rally_fetch_concurrency > 1 or args.rally_get_limit <= 100 else 1
 
-            is_timestamp = True
-            try:
-                datetime.strptime(str(column_value), '%Y-%m-%dT%H:%M:%S.%fZ')
-            except:
-                is_timestamp = False
-
-            sql_type = None
-
-            if is_timestamp:
-                sql_type = SqlType.timestamp()
-            elif isinstance(column_value, bool):
-                sql_type = SqlType.bool()
-            elif isinstance(column_value, int):
-                sql_type = SqlType.big_int()
-            elif isinstance(column_value, float):
-                sql_type = SqlType.double()
-            elif isinstance(column_value, list):
-                sql_type = SqlType.small_int()
-            elif isinstance(column_value, (str, Persistable)):
-                sql_type = SqlType.text()
-
-            if sql_type is None:
-                continue
 
-            entity_columns[column_name] = sql_type
+def _get_all_entities(entity_name: str) -> tuple[str, list[dict[str, Any]]]:
+    from .rally import get
+
+    _logger.info(f'Getting {entity_name} entities from Rally...')
+    errors: list[Exception] = []
+    entities = get(entity_name, errors=errors)
+    _record_load_errors(entity_name, errors)
+    return entity_name, entities
 
-    return entity_name, entity_columns
+
+def _process_entity(entity_name, rally_entities):
+    from .type_inference import infer_column_types
+
+    return entity_name, infer_column_types(rally_entities)
 
 
 def _create_table_def(entity_name: str, entity_columns: dict[str, SqlType]) -> TableDefinition:
@@ -356,47 +1140,40 @@ def _create_table_def(entity_name: str, entity_columns: dict[str, SqlType]) -> T
 def _create_table(table_def: TableDefinition):
     global dbs
 
-    dbs[table_def.table_name.name.unescaped].catalog.create_table(table_def)
+    db = dbs[table_def.table_name.name.unescaped]
+    db.execute_command(f'DROP TABLE IF EXISTS {table_def.table_name}')
+    db.catalog.create_table(table_def)
+    _drop_table_index(table_def.table_name.name.unescaped)
     _logger.info(f'Created the {table_def.table_name} table with {len(table_def.columns)} column(s)')
 
 
-def _process_row_values(table_name: str, row_data: Iterable[tuple[str, Any | None]]) -> list[Any] | None:
-    from datetime import datetime
-    from pyral.entity import Persistable
+def _get_table_index(entity_name: str) -> _TableIndex:
+    with _table_indexes_lock:
+        table_index = _table_indexes.get(entity_name)
+    if table_index is not None:
+        return table_index
 
-    if not row_data or not any(row_data):
-        return None
+    db = dbs[entity_name]
+    table_def = db.catalog.get_table_definition(entity_name)
+    object_uuid = table_def.get_column_by_name('ObjectUUID').name
+    object_ids = {row[0] for row in db.execute_list_query(query=f'SELECT {object_uuid} FROM {table_def.table_name}')}
 
-    row: list[Any] = []
-    for column_name, column_value in row_data:
-
-        if isinstance(column_value, dict):
-            if 'name' in column_value:
-                column_value = column_value['name']
-            elif 'value' in column_value:
-                column_value = column_value['value']
-
-        if column_value is None or str(column_value) in ['', 'None'] or str(column_value).isspace():
-            row.append(None)
-            continue
-
-        try:
-            value = datetime.strptime(str(column_value), '%Y-%m-%dT%H:%M:%S.%fZ')
-        except:
-            value = column_value
+    table_index = _TableIndex(
+        table_def=table_def,
+        columns={column.name.unescaped: column.name for column in table_def.columns},
+        object_uuid=object_uuid,
+        object_ids=object_ids
+    )
+    with _table_indexes_lock:
+        _table_indexes[entity_name] = table_index
 
-        global entity_column_defs
-        if isinstance(column_value, (int, float, bool)) and \
-           entity_column_defs[table_name][column_name] == SqlType.text():
-            value = str(column_value)
-        elif isinstance(column_value, list):
-            value = len(column_value)
-        elif isinstance(column_value, Persistable):
-            value = column_value.Name
+    _logger.info(f'Indexed {len(object_ids)} {entity_name} ObjectUUID(s)')
+    return table_index
 
-        row.append(value)
 
-    return row
+def _drop_table_index(entity_name: str) -> None:
+    with _table_indexes_lock:
+        _table_indexes.pop(entity_name, None)
 
 
 def _sanitize_column_name(column_name: str) -> str:
@@ -1,7 +1,10 @@
-from flask import Flask
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from flask import Flask
 
-def configure_logger(app: Flask) -> None:
+
+def configure_logger(app: 'Flask | None' = None) -> None:
     from sys import stdout
     from logging import StreamHandler, getLogger, INFO, Formatter
     from logging.handlers import TimedRotatingFileHandler
@@ -32,7 +35,8 @@ def configure_logger(app: Flask) -> None:
 
     log_level = INFO
     root.setLevel(log_level)
-    app.logger.setLevel(log_level)
+    if app is not None:
+        app.logger.setLevel(log_level)
 
     file_handler = TimedRotatingFileHandler('./tabby.log', when='midnight', interval=1, backupCount=7)
     file_formatter = Formatter('%(asctime)s : %(levelname)s : %(name)s : %(message)s', datefmt=date_format)
@@ -0,0 +1,205 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Iterator
+
+# Every metric, in the order they are rendered.
+_metrics: list['_Metric'] = []
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_LAG_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+_PUBLISH_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        # Only held for a dict update, so recording stays cheap on the webhook path.
+        self._lock = Lock()
+        _metrics.append(self)
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+    def _format_labels(self, label_values: tuple[str, ...], extra: str = '') -> str:
+        labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values)]
+        if extra:
+            labels.append(extra)
+        return '{' + ','.join(labels) + '}' if any(labels) else ''
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, description, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{self._format_labels(label_values)} {value}' for label_values, value in values]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: tuple[str, ...] = (),
+        function: Callable[[], float] | None = None
+    ):
+        # A gauge with a function is read when rendered, and never set.
+        super().__init__(name, description, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, *label_values: str, value: float) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> list[str]:
+        if self._function is not None:
+            return [f'{self.name} {self._function()}']
+
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{self._format_labels(label_values)} {value}' for label_values, value in values]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = _LATENCY_BUCKETS):
+        super().__init__(name, description, label_names)
+        self._buckets = buckets
+        # Per label values: a count for each bucket plus +Inf, and the sum.
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, *label_values: str, value: float) -> None:
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            counts, total = self._values.get(label_values) or self._values.setdefault(
+                label_values, ([0] * (len(self._buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*label_values, value=perf_counter() - start_time)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = [(label_values, list(counts), total[0]) for label_values, (counts, total) in self._values.items()]
+
+        lines = []
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bucket, count in zip([*self._buckets, float('inf')], counts):
+                cumulative += count
+                bound = 'le="+Inf"' if bucket == float('inf') else f'le="{bucket}"'
+                lines.append(f'{self.name}_bucket{self._format_labels(label_values, bound)} {cumulative}')
+            lines.append(f'{self.name}_sum{self._format_labels(label_values)} {total}')
+            lines.append(f'{self.name}_count{self._format_labels(label_values)} {cumulative}')
+
+        return lines
+
+
+def render_metrics() -> str:
+    # The Prometheus text exposition format.
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.render())
+
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _get_queue_depth() -> float:
+    from .webhook_processer import get_queue_depth
+
+    return get_queue_depth()
+
+
+def _get_queue_oldest_age() -> float:
+    from .webhook_processer import get_queue_oldest_age
+
+    return get_queue_oldest_age()
+
+
+WEBHOOKS_RECEIVED = Counter(
+    'tabby_webhooks_received_total', 'Webhooks received by the webhook endpoint.', ('entity',)
+)
+WEBHOOKS_REJECTED = Counter(
+    'tabby_webhooks_rejected_total', 'Webhooks refused by the queue limit or dropped as duplicates.', ('reason',)
+)
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    'tabby_webhook_queue_depth', 'Queued webhooks waiting to be applied.', function=_get_queue_depth
+)
+WEBHOOK_QUEUE_OLDEST_AGE = Gauge(
+    'tabby_webhook_queue_oldest_age_seconds', 'Seconds the oldest queued webhook has waited.', function=_get_queue_oldest_age
+)
+WEBHOOK_LAG = Histogram(
+    'tabby_webhook_lag_seconds', 'Seconds from the Rally transaction to the webhook being applied.', ('entity',), _LAG_BUCKETS
+)
+WEBHOOK_RALLY_LAG = Histogram(
+    'tabby_webhook_rally_message_lag_seconds', 'The message lag reported by Rally.', ('entity',), _LAG_BUCKETS
+)
+WEBHOOKS_APPLIED = Counter(
+    'tabby_webhooks_applied_total', 'Webhooks applied to the hyper databases, by result.', ('entity', 'action', 'result')
+)
+PROCESS_CHANGES_SECONDS = Histogram(
+    'tabby_process_changes_seconds', 'Seconds to apply a single webhook.', ('entity', 'action')
+)
+PROCESS_CHANGES_BATCH_SECONDS = Histogram(
+    'tabby_process_changes_batch_seconds', 'Seconds to apply a batch of webhooks.', ('entity',)
+)
+PUBLISH_CYCLE_SECONDS = Histogram(
+    'tabby_publish_cycle_seconds', 'Seconds to publish every data source that needed publishing.', (), _PUBLISH_BUCKETS
+)
+PUBLISH_SECONDS = Histogram(
+    'tabby_publish_seconds', 'Seconds to publish a data source, until its job finished.', ('entity', 'mode'), _PUBLISH_BUCKETS
+)
+PUBLISH_BYTES = Counter(
+    'tabby_publish_bytes_total', 'Bytes uploaded to Tableau.', ('entity', 'mode')
+)
+PUBLISH_FAILURES = Counter(
+    'tabby_publish_failures_total', 'Failed data source publishes.', ('entity',)
+)
+BULK_LOAD_PHASE_SECONDS = Gauge(
+    'tabby_bulk_load_phase_seconds', 'Seconds spent in each phase of the last bulk load.', ('phase',)
+)
+
+
+@contextmanager
+def time_bulk_load_phase(phase: str) -> Iterator[None]:
+    from .profiler import BULK_LOAD, record_phase
+
+    start_time = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start_time
+        BULK_LOAD_PHASE_SECONDS.set(phase, value=seconds)
+        record_phase(BULK_LOAD, phase, seconds)
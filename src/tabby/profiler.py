@@ -0,0 +1,191 @@
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from logging import getLogger
+from threading import Lock, local
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, TypeVar
+
+if TYPE_CHECKING:
+    from pstats import Stats
+
+_logger = getLogger(__name__)
+
+T = TypeVar('T')
+
+BULK_LOAD = 'bulk-load'
+WEBHOOKS = 'webhooks'
+
+
+@dataclass
+class _Profile:
+    name: str
+    start_time: float = field(default_factory=time)
+    start_counter: float = field(default_factory=perf_counter)
+    # Seconds and calls per phase, and per entity within each phase.
+    phases: dict[str, list[float]] = field(default_factory=dict)
+    entities: dict[str, dict[str, list[float]]] = field(default_factory=dict)
+    stats: 'Stats | None' = None
+
+
+# The profiles being recorded, by name. Sections look their profile up here, so nothing is recorded when it is empty.
+_profiles: dict[str, _Profile] = {}
+_profiles_lock = Lock()
+
+# Whether the current thread is already running cProfile, since a thread can only run one profiler at a time.
+_thread_state = local()
+
+_NOT_PROFILED = nullcontext()
+
+
+def start_profile(name: str, seconds: float = 0) -> None:
+    from .args import args
+
+    # Profiles until finish_profile, or for the given seconds.
+    if not args.profile:
+        return
+
+    with _profiles_lock:
+        _profiles[name] = _Profile(name)
+
+    if seconds > 0:
+        from threading import Timer
+
+        timer = Timer(seconds, finish_profile, args=(name,))
+        timer.daemon = True
+        timer.start()
+
+
+def finish_profile(name: str) -> None:
+    # Writes the timing report, and the cProfile stats if captured, to the profiles directory.
+    with _profiles_lock:
+        profile = _profiles.pop(name, None)
+    if profile is None:
+        return
+
+    from datetime import datetime
+    from json import dump
+    from pathlib import PurePath
+
+    seconds = perf_counter() - profile.start_counter
+    with _profiles_lock:
+        report = {
+            'name': profile.name,
+            'started': datetime.fromtimestamp(profile.start_time).isoformat(),
+            'seconds': seconds,
+            'phases': {
+                phase: {
+                    'seconds': phase_seconds,
+                    'calls': int(calls),
+                    'entities': {
+                        entity: {'seconds': entity_seconds, 'calls': int(entity_calls)}
+                        for entity, (entity_seconds, entity_calls) in profile.entities.get(phase, {}).items()
+                    }
+                }
+                for phase, (phase_seconds, calls) in profile.phases.items()
+            }
+        }
+        stats = profile.stats
+
+    path = PurePath(_get_profile_dir(), f'{name}-{datetime.fromtimestamp(profile.start_time).strftime('%Y%m%d-%H%M%S')}')
+    with open(f'{path}.json', 'w') as file:
+        dump(report, file, indent=2)
+    if stats is not None:
+        stats.dump_stats(f'{path}.prof')
+
+    phase_summary = ', '.join(f'{phase} {phase_seconds:.2f}s' for phase, (phase_seconds, _) in profile.phases.items())
+    _logger.info(f'Profiled {name} for {seconds:.2f}s ({phase_summary}), wrote {path}.json')
+
+
+def record_phase(name: str, phase: str, seconds: float) -> None:
+    profile = _profiles.get(name)
+    if profile is None:
+        return
+
+    with _profiles_lock:
+        _add_timing(profile.phases, phase, seconds)
+
+
+def profile_phase(name: str, phase: str) -> ContextManager[Any]:
+    # Times a section of work spread over threads. Use profile_entity for the work itself.
+    profile = _profiles.get(name)
+    if profile is None:
+        return _NOT_PROFILED
+
+    return _Section(profile, phase)
+
+
+def profile_entity(name: str, phase: str, entity: str) -> ContextManager[Any]:
+    # Times the work for one entity within a phase, and runs cProfile on it when enabled.
+    profile = _profiles.get(name)
+    if profile is None:
+        return _NOT_PROFILED
+
+    return _Section(profile, phase, entity)
+
+
+def profile_call(name: str, phase: str, entity: str, function: Callable[..., T], *function_args: Any) -> T:
+    # profile_entity around a call, for work submitted to executors.
+    with profile_entity(name, phase, entity):
+        return function(*function_args)
+
+
+class _Section:
+    def __init__(self, profile: _Profile, phase: str, entity: str | None = None):
+        self._profile = profile
+        self._phase = phase
+        self._entity = entity
+        self._profiler = None
+        self._start_time = 0.0
+
+    def __enter__(self) -> None:
+        from .args import args
+
+        if self._entity is not None and args.profile_cprofile and not getattr(_thread_state, 'is_profiling', False):
+            from cProfile import Profile
+
+            self._profiler = Profile()
+            try:
+                self._profiler.enable()
+                _thread_state.is_profiling = True
+            except ValueError:
+                # Another profiler is running on this thread.
+                self._profiler = None
+
+        self._start_time = perf_counter()
+
+    def __exit__(self, *_: Any) -> None:
+        from pstats import Stats
+
+        seconds = perf_counter() - self._start_time
+        if self._profiler is not None:
+            self._profiler.disable()
+            _thread_state.is_profiling = False
+
+        with _profiles_lock:
+            if self._entity is None:
+                _add_timing(self._profile.phases, self._phase, seconds)
+            else:
+                _add_timing(self._profile.entities.setdefault(self._phase, {}), self._entity, seconds)
+
+            if self._profiler is not None:
+                if self._profile.stats is None:
+                    self._profile.stats = Stats(self._profiler)
+                else:
+                    self._profile.stats.add(self._profiler)
+
+
+def _add_timing(timings: dict[str, list[float]], key: str, seconds: float) -> None:
+    timing = timings.setdefault(key, [0.0, 0])
+    timing[0] += seconds
+    timing[1] += 1
+
+
+def _get_profile_dir() -> str:
+    from os import makedirs
+    from pathlib import PurePath
+
+    from .args import args
+
+    profile_dir = str(PurePath(args.tableau_datasource_dir, 'profiles'))
+    makedirs(profile_dir, exist_ok=True)
+    return profile_dir
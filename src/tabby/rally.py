@@ -1,30 +1,68 @@
-from typing import cast, Any
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from threading import Lock
+from typing import cast, Any, Iterator
 
 from pyral import Rally, RallyRESTResponse
 
+_logger = getLogger(__name__)
+
 _rally: Rally | None = None
+_rally_lock = Lock()
+
+# Shared by every entity, so the number of in-flight page requests never exceeds rally_fetch_concurrency.
+_fetch_executor: ThreadPoolExecutor | None = None
+_fetch_executor_lock = Lock()
+
+_FETCH_BACKOFF_SECONDS = 1.0
 
 
 def start_rally() -> None:
-    from .args import args
+    _get_rally()
 
-    global _rally
-    _rally = Rally(apikey=args.rally_apikey)
-    _rally.enableLogging('rally.log')
 
+class IncompleteFetchError(Exception):
+    # Reported for a get that rally_get_limit cut short, rather than one that lost pages.
+    def __init__(self, entity: str, fetched: int, result_count: int):
+        super().__init__(f'Got {fetched} of {result_count} {entity} records, limited by rally_get_limit')
+        self.fetched = fetched
+        self.result_count = result_count
+
+
+def get(
+    entity: str,
+    query: str | None = None,
+    order: str | None = None,
+    errors: list[Exception] | None = None
+) -> list[dict[str, Any]]:
+    entity_dicts: list[dict[str, Any]] = []
+    for page in get_pages(entity, query=query, order=order, errors=errors):
+        entity_dicts.extend(page)
+
+    return entity_dicts
 
-def get(entity: str) -> list[dict[str, Any]]:
-    from datetime import datetime
-    from sys import stdout
-    from logging import getLogger
 
+def get_pages(
+    entity: str,
+    query: str | None = None,
+    order: str | None = None,
+    errors: list[Exception] | None = None
+) -> Iterator[list[dict[str, Any]]]:
+    # A page that fails is logged and skipped. Callers that need every record pass errors, which gets the error of
+    # each skipped page, or an IncompleteFetchError when there were more records than rally_get_limit.
     from .args import args
 
+    if args.rally_fetch_concurrency > 1:
+        yield from _get_pages_concurrently(entity, query, order, errors)
+        return
+
     rally_entities = cast(
         RallyRESTResponse,
-        _rally.get(
+        _get_rally().get(
             entity,
             fetch=True,
+            query=query,
+            order=order,
             projectScopeUp=True,
             projectScopeDown=True,
             pagesize=args.rally_get_pagesize,
@@ -33,21 +71,178 @@ def get(entity: str) -> list[dict[str, Any]]:
     )
 
     total = min(args.rally_get_limit, rally_entities.resultCount)
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    gray_timestamp = f'\033[37m{timestamp}\033[0m'
-    green_info = f'\033[32mINFO\033[0m'
 
-    entity_dicts: list[dict[str, Any]] = []
+    # pyral retrieves pages lazily while iterating, so only the current page is held in memory.
+    page: list[dict[str, Any]] = []
+    page_errors: list[Exception] = []
+    fetched = 0
     try:
         for i, entity_object in enumerate(rally_entities):
-            entity_dicts.append(entity_object.__dict__)
+            page.append(entity_object.__dict__)
+            fetched += 1
 
             if i % 5 == 0 or i >= total - 1:
-                percentage = (len(entity_dicts) / total) * 100
-                print(f'\r{gray_timestamp} {green_info}     Loading {total} {entity} records ({percentage:05.2f}%)', end='')
-                stdout.flush()
+                _log_progress(entity, i + 1, total)
+
+            if len(page) >= args.rally_get_pagesize:
+                yield page
+                page = []
     except Exception as ex:
-        getLogger(__name__).error(str(ex))
+        _logger.error(str(ex))
+        page_errors.append(ex)
 
     print()
-    return entity_dicts
+    if any(page):
+        yield page
+
+    _report_errors(errors, entity, page_errors, fetched, rally_entities.resultCount)
+
+
+def _get_pages_concurrently(
+    entity: str,
+    query: str | None,
+    order: str | None,
+    errors: list[Exception] | None
+) -> Iterator[list[dict[str, Any]]]:
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    from .args import args
+
+    # The first page also tells us how many records there are, so the remaining pages can be requested in parallel.
+    # Pages are yielded as they complete, not in Rally's order. Every page, the first included, is fetched on the
+    # shared executor, so entities loading in parallel never exceed rally_fetch_concurrency requests.
+    executor = _get_fetch_executor()
+    result_count, first_page = executor.submit(
+        _get_page, entity, query, order, 1, min(args.rally_get_pagesize, args.rally_get_limit)
+    ).result()
+    total = min(args.rally_get_limit, result_count)
+    first_page = first_page[:total]
+    loaded = len(first_page)
+    _log_progress(entity, loaded, total)
+    if any(first_page):
+        yield first_page
+
+    starts = iter(range(1 + args.rally_get_pagesize, total + 1, args.rally_get_pagesize))
+    pending = set()
+    page_errors: list[Exception] = []
+    while True:
+        # Keep at most rally_fetch_concurrency pages of this entity in flight to bound memory.
+        while len(pending) < args.rally_fetch_concurrency:
+            start = next(starts, None)
+            if start is None:
+                break
+            pending.add(
+                executor.submit(_get_page, entity, query, order, start, min(args.rally_get_pagesize, total - start + 1))
+            )
+
+        if not pending:
+            break
+
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                _, page = future.result()
+            except Exception as ex:
+                _logger.error(f'Skipping a page of {entity} records: {ex}')
+                page_errors.append(ex)
+                continue
+
+            loaded += len(page)
+            _log_progress(entity, loaded, total)
+            yield page
+
+    print()
+    _report_errors(errors, entity, page_errors, loaded, result_count)
+
+
+def _report_errors(
+    errors: list[Exception] | None,
+    entity: str,
+    page_errors: list[Exception],
+    fetched: int,
+    result_count: int
+) -> None:
+    if errors is None:
+        return
+
+    errors.extend(page_errors)
+    if not any(page_errors) and fetched < result_count:
+        errors.append(IncompleteFetchError(entity, fetched, result_count))
+
+
+def _get_page(
+    entity: str,
+    query: str | None,
+    order: str | None,
+    start: int,
+    limit: int
+) -> tuple[int, list[dict[str, Any]]]:
+    from time import sleep
+
+    from .args import args
+
+    for attempt in range(args.rally_fetch_retries + 1):
+        try:
+            rally_entities = cast(
+                RallyRESTResponse,
+                _get_rally().get(
+                    entity,
+                    fetch=True,
+                    query=query,
+                    order=order,
+                    projectScopeUp=True,
+                    projectScopeDown=True,
+                    pagesize=args.rally_get_pagesize,
+                    start=start,
+                    limit=limit,
+                    threads=1
+                )
+            )
+            if rally_entities.errors:
+                raise RuntimeError('; '.join(str(error) for error in rally_entities.errors))
+
+            return rally_entities.resultCount, [entity_object.__dict__ for entity_object in rally_entities]
+        except Exception as ex:
+            if attempt >= args.rally_fetch_retries:
+                raise
+
+            delay = _FETCH_BACKOFF_SECONDS * 2 ** attempt
+            _logger.warning(f'Retrying {entity} page at {start} in {delay:.0f}s: {ex}')
+            sleep(delay)
+
+
+def _get_rally() -> Rally:
+    from .args import args
+
+    # Connecting takes a few requests, so it happens when Rally is first needed unless start_rally was called.
+    global _rally
+    with _rally_lock:
+        if _rally is None:
+            _rally = Rally(apikey=args.rally_apikey)
+            _rally.enableLogging('rally.log')
+
+        return _rally
+
+
+def _get_fetch_executor() -> ThreadPoolExecutor:
+    from .args import args
+
+    global _fetch_executor
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(max_workers=args.rally_fetch_concurrency, thread_name_prefix='rally-fetch')
+
+        return _fetch_executor
+
+
+def _log_progress(entity: str, loaded: int, total: int) -> None:
+    from datetime import datetime
+    from sys import stdout
+
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    gray_timestamp = f'\033[37m{timestamp}\033[0m'
+    green_info = f'\033[32mINFO\033[0m'
+
+    percentage = (loaded / total) * 100 if total else 100
+    print(f'\r{gray_timestamp} {green_info}     Loading {total} {entity} records ({percentage:05.2f}%)', end='')
+    stdout.flush()
@@ -1,26 +1,34 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cache, cached_property
 from http import HTTPStatus
 from typing import Any, Optional
 
-from flask import abort
-from marshmallow import EXCLUDE
-from marshmallow_dataclass import class_schema
-
 
 @dataclass
 class Webhook:
     message: 'Message'
-    rule: 'Rule'
     Timestamp: str
+    rule_json: dict = field(metadata={'data_key': 'rule'})
+
+    # Set when the webhook is written to the webhook journal, so it can be marked applied once processed.
+    journal_sequence: Optional[int] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def from_json(cls, json: Optional[dict]) -> 'Webhook':
         try:
-            webhook_schema = WebhookSchema()
-            return webhook_schema.load(json, unknown=EXCLUDE)
+            return _decode_webhook(json)
         except Exception as ex:
+            from flask import abort
+
             abort(HTTPStatus.BAD_REQUEST, str(ex))
 
+    @cached_property
+    def rule(self) -> 'Rule':
+        # The processor never reads the rule, so it is only decoded when asked for.
+        from marshmallow import EXCLUDE
+
+        return _get_rule_schema().load(self.rule_json, unknown=EXCLUDE)
+
 
 @dataclass
 class Message:
@@ -47,7 +55,7 @@ class Transaction:
     message_id: str
     parent_span_id: str
     span_id: str
-    message_lag: int
+    message_lag: int | None
 
 
 @dataclass
@@ -127,13 +135,154 @@ class Expression:
     Value: Any
 
 
-WebhookSchema = class_schema(Webhook)
-MessageSchema = class_schema(Message)
-TransactionSchema = class_schema(Transaction)
-UserSchema = class_schema(User)
-AttributeSchema = class_schema(Attribute)
-ProjectSchema = class_schema(Project)
-ChangeSchema = class_schema(Change)
-ObjectSchema = class_schema(Object)
-RuleSchema = class_schema(Rule)
-ExpressionSchema = class_schema(Expression)
+# The marshmallow schemas, e.g. WebhookSchema, are built when first imported, since building them is slow.
+_SCHEMA_DATACLASSES = {
+    'WebhookSchema': Webhook,
+    'MessageSchema': Message,
+    'TransactionSchema': Transaction,
+    'UserSchema': User,
+    'AttributeSchema': Attribute,
+    'ProjectSchema': Project,
+    'ChangeSchema': Change,
+    'ObjectSchema': Object,
+    'RuleSchema': Rule,
+    'ExpressionSchema': Expression,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _SCHEMA_DATACLASSES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    return _get_schema(name)
+
+
+@cache
+def _get_schema(name: str) -> type:
+    from marshmallow_dataclass import class_schema
+
+    return class_schema(_SCHEMA_DATACLASSES[name])
+
+
+@cache
+def _get_rule_schema() -> Any:
+    return _get_schema('RuleSchema')()
+
+
+# Decodes webhooks straight into the dataclasses above, which is much faster than loading them through WebhookSchema.
+# Fields the processor reads are validated like the schema would. The rest are copied as they are.
+def _decode_webhook(json: Any) -> Webhook:
+    json = _require_type(json, dict, 'webhook')
+    return Webhook(
+        message=_decode_message(_require(json, 'message', dict, '')),
+        Timestamp=_require(json, 'Timestamp', str, ''),
+        rule_json=_require(json, 'rule', dict, '')
+    )
+
+
+def _decode_message(json: dict) -> Message:
+    path = 'message.'
+    project = json.get('project')
+    return Message(
+        object_id=_require(json, 'object_id', str, path),
+        ref=json.get('ref'),
+        object_type=_require(json, 'object_type', str, path),
+        transaction=_decode_transaction(_require(json, 'transaction', dict, path)),
+        state={
+            key: _decode_attribute(_require_type(value, dict, f'{path}state.{key}'), f'{path}state.{key}.')
+            for key, value in _require(json, 'state', dict, path).items()
+        },
+        subscription_id=json.get('subscription_id'),
+        message_id=_require(json, 'message_id', str, path),
+        project=Project(uuid=project.get('uuid'), name=project.get('name')) if isinstance(project, dict) else project,
+        id=json.get('id'),
+        detail_link=json.get('detail_link'),
+        message_version=json.get('message_version'),
+        changes={
+            key: _decode_change(_require_type(value, dict, f'{path}changes.{key}'), f'{path}changes.{key}.')
+            for key, value in _require(json, 'changes', dict, path).items()
+        },
+        action=_require(json, 'action', str, path)
+    )
+
+
+def _decode_transaction(json: dict) -> Transaction:
+    path = 'message.transaction.'
+    user = _require(json, 'user', dict, path)
+    return Transaction(
+        trace_id=_require(json, 'trace_id', str, path),
+        timestamp=_require(json, 'timestamp', int, path),
+        user=User(
+            uuid=user.get('uuid'),
+            username=user.get('username'),
+            email=_require(user, 'email', str, f'{path}user.')
+        ),
+        message_id=_require(json, 'message_id', str, path),
+        parent_span_id=json.get('parent_span_id'),
+        span_id=json.get('span_id'),
+        message_lag=_optional(json, 'message_lag', int, path)
+    )
+
+
+def _decode_attribute(json: dict, path: str) -> Attribute:
+    return Attribute(
+        value=json.get('value'),
+        type=json.get('type'),
+        name=_require(json, 'name', str, path),
+        display_name=json.get('display_name'),
+        ref=json.get('ref')
+    )
+
+
+def _decode_change(json: dict, path: str) -> Change:
+    return Change(
+        value=json.get('value'),
+        old_value=json.get('old_value'),
+        added=_decode_objects(json.get('added'), f'{path}added'),
+        removed=_decode_objects(json.get('removed'), f'{path}removed'),
+        type=_require(json, 'type', str, path),
+        name=_require(json, 'name', str, path),
+        display_name=_require(json, 'display_name', str, path),
+        ref=json.get('ref')
+    )
+
+
+def _decode_objects(json: Any, path: str) -> Optional[list[Object]]:
+    if json is None:
+        return None
+
+    objects = []
+    for item in _require_type(json, list, path):
+        item = _require_type(item, dict, path)
+        objects.append(Object(
+            name=item.get('name'),
+            formatted_id=item.get('formatted_id'),
+            ref=item.get('ref'),
+            detail_link=item.get('detail_link'),
+            id=item.get('id'),
+            object_type=item.get('object_type')
+        ))
+
+    return objects
+
+
+def _require(json: dict, key: str, value_type: type, path: str) -> Any:
+    if key not in json or json[key] is None:
+        raise ValueError(f'{path}{key}: Missing data for required field.')
+
+    return _require_type(json[key], value_type, f'{path}{key}')
+
+
+def _optional(json: dict, key: str, value_type: type, path: str) -> Any:
+    if json.get(key) is None:
+        return None
+
+    return _require_type(json[key], value_type, f'{path}{key}')
+
+
+def _require_type(value: Any, value_type: type, path: str) -> Any:
+    # bool is an int subclass, but is never a valid int here.
+    if not isinstance(value, value_type) or (value_type is int and isinstance(value, bool)):
+        raise ValueError(f'{path}: Not a valid {value_type.__name__}.')
+
+    return value
@@ -0,0 +1,194 @@
+from datetime import datetime
+from functools import cache
+from logging import getLogger
+from pickle import Pickler
+from threading import Lock
+from typing import Any, Callable
+
+from tableauhyperapi import SqlType
+
+from .type_inference import SQL_TYPE_NAMES, parse_rally_timestamp
+
+_logger = getLogger(__name__)
+
+RowConverter = Callable[[dict[str, Any]], list[Any]]
+
+# pyral's entity base class, imported when rows are first converted since pyral is slow to import.
+_persistable: type | None = None
+
+# The Python types the Inserter accepts for each column type. Other values are coerced or dropped.
+_FITTING_TYPES: dict[str, tuple[type, ...]] = {
+    str(SqlType.timestamp()): (datetime,),
+    str(SqlType.bool()): (bool,),
+    str(SqlType.big_int()): (int,),
+    str(SqlType.small_int()): (int,),
+    str(SqlType.double()): (float,),
+    str(SqlType.text()): (str,),
+}
+
+# Columns that have already had a value dropped, so the warning is logged once per column.
+_mismatched_columns: set[str] = set()
+_mismatched_columns_lock = Lock()
+
+
+def compile_row_converter(columns: list[tuple[str, SqlType]]) -> RowConverter:
+    # columns holds the Rally attribute name and type of each table column, in table order.
+    # Picking the conversion for every column up front keeps per-cell work to a single call.
+    _import_persistable()
+    converters = [(column_name, _get_value_converter(column_name, column_type)) for column_name, column_type in columns]
+
+    def convert_row(row_dict: dict[str, Any]) -> list[Any]:
+        get = row_dict.get
+        return [convert_value(get(column_name)) for column_name, convert_value in converters]
+
+    return convert_row
+
+
+def pickle_plain_rows(row_dicts: list[dict[str, Any]], column_names: list[str]) -> bytes:
+    # pyral objects cannot be sent to other processes, so the pickler reduces them to their name, which is also what
+    # they convert to. Plain values are pickled without calling back into Python, so the sending process only
+    # gathers each row's values and the worker does the rest of the per-cell work.
+    from io import BytesIO
+    from pickle import HIGHEST_PROTOCOL
+
+    _import_persistable()
+    buffer = BytesIO()
+    _PlainRowPickler(buffer, protocol=HIGHEST_PROTOCOL).dump(
+        [[row_dict.get(column_name) for column_name in column_names] for row_dict in row_dicts]
+    )
+    return buffer.getvalue()
+
+
+def convert_plain_rows(columns: list[tuple[str, str]], pickled_rows: bytes) -> list[list[Any]]:
+    # Runs in worker processes. columns holds (Rally attribute name, SQL_TYPE_NAMES key) pairs in table order,
+    # and pickled_rows the output of pickle_plain_rows for the same columns.
+    from pickle import loads
+
+    column_names = [column_name for column_name, _ in columns]
+    convert_row = _compile_named_row_converter(tuple(columns))
+    return [convert_row(dict(zip(column_names, plain_row))) for plain_row in loads(pickled_rows)]
+
+
+@cache
+def _compile_named_row_converter(columns: tuple[tuple[str, str], ...]) -> RowConverter:
+    return compile_row_converter([(column_name, SQL_TYPE_NAMES[type_name]) for column_name, type_name in columns])
+
+
+def _get_value_converter(column_name: str, column_type: SqlType) -> Callable[[Any], Any]:
+    # Column types can be inferred from a sample of the records, so a later value may not fit its column.
+    # Such values are coerced to the column type, or dropped, rather than failing the whole insert.
+    if column_type == SqlType.timestamp():
+        convert = _convert_timestamp
+    elif column_type == SqlType.text():
+        convert = _convert_text
+    else:
+        convert = _convert_value
+
+    type_name = str(column_type)
+    fitting_types = _FITTING_TYPES[type_name]
+
+    def convert_value(value: Any) -> Any:
+        value = convert(value)
+        # Exact types, since a bool is also an int.
+        if value is None or type(value) in fitting_types:
+            return value
+
+        return _coerce_value(column_name, type_name, value)
+
+    return convert_value
+
+
+def _convert_timestamp(value: Any) -> Any:
+    value = _unwrap_value(value)
+    if value is None:
+        return None
+
+    return parse_rally_timestamp(value) or _convert_object(value)
+
+
+def _coerce_value(column_name: str, type_name: str, value: Any) -> Any:
+    coerced = None
+    try:
+        if type_name == 'TEXT':
+            coerced = str(value)
+        elif type_name == 'DOUBLE':
+            if isinstance(value, (int, float, str)):
+                coerced = float(value)
+        elif type_name in ('BIG_INT', 'SMALL_INT'):
+            if isinstance(value, float) and value.is_integer() or isinstance(value, (bool, str)):
+                coerced = int(value)
+        elif type_name == 'BOOL':
+            if isinstance(value, str) and value.lower() in ('true', 'false'):
+                coerced = value.lower() == 'true'
+    except ValueError:
+        pass
+
+    if coerced is None:
+        with _mismatched_columns_lock:
+            warn = column_name not in _mismatched_columns
+            _mismatched_columns.add(column_name)
+        if warn:
+            _logger.warning(
+                f'Dropping {type(value).__name__} values that do not fit the {type_name} column {column_name}. '
+                f'When streaming, a larger --rally_stream_sample_size lets the column type account for them.'
+            )
+
+    return coerced
+
+
+def _convert_text(value: Any) -> Any:
+    value = _unwrap_value(value)
+    if isinstance(value, (int, float, bool)):
+        return str(value)
+
+    return _convert_object(value)
+
+
+def _convert_value(value: Any) -> Any:
+    return _convert_object(_unwrap_value(value))
+
+
+def _convert_object(value: Any) -> Any:
+    if isinstance(value, list):
+        return len(value)
+    if isinstance(value, _persistable):
+        return value.Name
+
+    return value
+
+
+class _PlainRowPickler(Pickler):
+    def reducer_override(self, obj: Any) -> Any:
+        if isinstance(obj, _persistable):
+            return str, (obj.Name,)
+
+        return NotImplemented
+
+
+def _import_persistable() -> None:
+    from pyral.entity import Persistable
+
+    global _persistable
+    _persistable = Persistable
+
+
+def _unwrap_value(value: Any) -> Any:
+    if value is None:
+        return None
+
+    if isinstance(value, dict):
+        if 'name' in value:
+            value = value['name']
+        elif 'value' in value:
+            value = value['value']
+
+        if value is None:
+            return None
+
+    if isinstance(value, str):
+        if value == '' or value == 'None' or value.isspace():
+            return None
+    elif not isinstance(value, (int, float, list)) and str(value) in ['', 'None']:
+        return None
+
+    return value
@@ -2,28 +2,57 @@ from http import HTTPStatus
 
 from flask import Flask, request
 
+from .args import args, configure
 from .logger import configure_logger
+from .metrics import WEBHOOK_RALLY_LAG, WEBHOOKS_RECEIVED, WEBHOOKS_REJECTED, render_metrics
 from .request_schemas import Webhook
 from .tabby_start import start_tabby
-from .webhook_processer import enqueue_webhook_for_processing
+from .webhook_journal import journal_webhook
+from .webhook_processer import enqueue_webhook_for_processing, is_duplicate_webhook, is_webhook_queue_full
 
 tabby = Flask(__name__)
 configure_logger(tabby)
 
+_QUEUE_FULL_RETRY_AFTER_SECONDS = 30
+
 
 @tabby.route('/')
 def home():
     return 'Hello, Tabby!', HTTPStatus.OK
 
 
+@tabby.route('/metrics')
+def metrics():
+    return render_metrics(), HTTPStatus.OK, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
 @tabby.route('/webhooks/9bef1c1e-996f-41a6-9370-de0423d0746b', methods=['POST'])
 def webhooks():
+    # Refuse before decoding, so a full queue costs as little as possible. Rally retries refused webhooks.
+    if is_webhook_queue_full():
+        WEBHOOKS_REJECTED.inc('queue_full')
+        return 'Webhook queue is full', HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': str(_QUEUE_FULL_RETRY_AFTER_SECONDS)}
+
     webhook = Webhook.from_json(request.json)
-    enqueue_webhook_for_processing(webhook)
+    WEBHOOKS_RECEIVED.inc(webhook.message.object_type)
+    if webhook.message.transaction.message_lag is not None:
+        # Rally reports the lag in milliseconds.
+        WEBHOOK_RALLY_LAG.observe(webhook.message.object_type, value=webhook.message.transaction.message_lag / 1000)
+
+    # Check for duplicates first, so a redelivered webhook is never written to the journal.
+    if is_duplicate_webhook(webhook):
+        WEBHOOKS_REJECTED.inc('duplicate')
+        return '', HTTPStatus.OK
+
+    if args.rally_webhook_journal:
+        journal_webhook(webhook, request.json)
+
+    enqueue_webhook_for_processing(webhook, deduplicate=False)
     return '', HTTPStatus.OK
 
 
 def main():
+    configure()
     start_tabby(tabby)
 
 
@@ -1,24 +1,105 @@
-from flask import Flask
+from logging import getLogger
+from threading import Thread
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from flask import Flask
 
-def start_tabby(tabby: Flask) -> None:
-    from .rally import start_rally
-    from .hyper import start_hyper
-    from .cloud_publisher import start_cloud_publisher
+_logger = getLogger(__name__)
+
+# Starts hyper, publishing and the webhook processor in the background, with --lazy_start.
+_background_start: Thread | None = None
+
+
+def main() -> None:
+    from .args import configure
+
+    # Script mode never serves, so it skips importing the Flask app.
+    config = configure()
+    if config.run_as_script:
+        from .logger import configure_logger
+
+        configure_logger()
+        start_services()
+        return
+
+    from .tabby import tabby
+    start_tabby(tabby)
+
+
+def start_tabby(tabby: 'Flask') -> None:
     from .args import args
-    from .webhook_processer import start_webhook_processor
     from .ngrok import start_ngrok
 
-    start_rally()
+    start_services()
+
+    if not args.run_as_script:
+        # TODO: Refresh rally webhook on start with args.rally_entities
+
+        start_ngrok()
+
+        if args.server == 'waitress':
+            from waitress import serve
+
+            serve(tabby, host='127.0.0.1', port=args.port, threads=args.server_threads)
+        else:
+            tabby.run(port=args.port)
+
+
+def start_services() -> None:
+    # Starts everything but ngrok and the server. Returns once webhooks can be accepted.
+    from .args import args
+
+    global _background_start
+    if not args.lazy_start:
+        from .rally import start_rally
+
+        start_rally()
+
+    if not args.run_as_script and args.rally_webhook_journal:
+        from .webhook_journal import start_webhook_journal
+        from .webhook_processer import enqueue_webhook_for_processing
+
+        for webhook in start_webhook_journal():
+            enqueue_webhook_for_processing(webhook)
+
+    if args.lazy_start and not args.run_as_script:
+        # Webhooks received meanwhile wait in the queue, since the processor starts after hyper has loaded.
+        _background_start = Thread(target=_start_in_background, name='tabby-start', daemon=True)
+        _background_start.start()
+    else:
+        _start_hyper_services()
+
+
+def wait_for_start(timeout: float | None = None) -> None:
+    # Waits until the services started in the background with --lazy_start are running.
+    if _background_start is not None:
+        _background_start.join(timeout)
+
+
+def _start_in_background() -> None:
+    from _thread import interrupt_main
+
+    try:
+        _start_hyper_services()
+    except Exception as ex:
+        # Without hyper no webhook can be applied, so stop the server like a failed eager start would.
+        _logger.critical(f'Failed to start: {ex}')
+        interrupt_main()
+
+
+def _start_hyper_services() -> None:
+    from .args import args
+    from .hyper import start_hyper
+
     start_hyper()
 
     if args.tableau_publish:
+        from .cloud_publisher import start_cloud_publisher
+
         start_cloud_publisher()
 
     if not args.run_as_script:
-        # TODO: Refresh rally webhook on start with args.rally_entities
+        from .webhook_processer import start_webhook_processor
 
         start_webhook_processor()
-        start_ngrok()
-
-        tabby.run(port=args.port)
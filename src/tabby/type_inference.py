@@ -0,0 +1,80 @@
+from datetime import datetime
+from typing import Any, Iterable
+
+from tableauhyperapi import SqlType
+
+_TIMESTAMP = SqlType.timestamp()
+_BIG_INT = SqlType.big_int()
+_DOUBLE = SqlType.double()
+
+# Stable names for every type inference can produce, used when column types are persisted or sent to other processes.
+SQL_TYPE_NAMES: dict[str, SqlType] = {
+    'timestamp': SqlType.timestamp(),
+    'bool': SqlType.bool(),
+    'big_int': SqlType.big_int(),
+    'double': SqlType.double(),
+    'small_int': SqlType.small_int(),
+    'text': SqlType.text(),
+}
+
+
+def infer_column_types(rally_entities: Iterable[dict[str, Any]]) -> dict[str, SqlType]:
+    from pyral.entity import Persistable
+
+    # Each column is typed by its first non-None value and then skipped, so every timestamp is parsed at most once
+    # per column. Integer columns keep being checked so that they can widen to double.
+    entity_columns: dict[str, SqlType] = {}
+    for row_dict in rally_entities:
+        if not row_dict:
+            continue
+
+        for column_name, column_value in row_dict.items():
+            if column_value is None:
+                continue
+
+            column_type = entity_columns.get(column_name)
+            if column_type is not None:
+                if column_type == _BIG_INT and isinstance(column_value, float):
+                    entity_columns[column_name] = _DOUBLE
+                continue
+
+            if str(column_name) == 'oid' or str(column_name).startswith('_'):
+                continue
+
+            sql_type = None
+
+            if is_rally_timestamp(column_value):
+                sql_type = _TIMESTAMP
+            elif isinstance(column_value, bool):
+                sql_type = SqlType.bool()
+            elif isinstance(column_value, int):
+                sql_type = _BIG_INT
+            elif isinstance(column_value, float):
+                sql_type = _DOUBLE
+            elif isinstance(column_value, list):
+                sql_type = SqlType.small_int()
+            elif isinstance(column_value, (str, Persistable)):
+                sql_type = SqlType.text()
+
+            if sql_type is None:
+                continue
+
+            entity_columns[column_name] = sql_type
+
+    return entity_columns
+
+
+def is_rally_timestamp(value: Any) -> bool:
+    return parse_rally_timestamp(value) is not None
+
+
+def parse_rally_timestamp(value: Any) -> datetime | None:
+    # Rally timestamps look like 2024-01-02T03:04:05.678Z. Check the shape before paying for a parse.
+    if not isinstance(value, str) or len(value) < 21 or value[-1] != 'Z' or value[10] != 'T' or value[19] != '.' or \
+       value[4] != '-' or value[7] != '-' or value[13] != ':' or value[16] != ':':
+        return None
+
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except ValueError:
+        return None
@@ -0,0 +1,49 @@
+from dataclasses import replace
+
+from .request_schemas import Change, Webhook
+
+
+def coalesce_webhooks(webhooks: list[Webhook]) -> list[Webhook]:
+    # Merges the webhooks of a single object into as few webhooks as possible, usually one.
+    # Updates merge with last-write-wins scalars and summed collection deltas, and anything followed by
+    # a recycle is just the recycle. A create keeps its own write, since it is ignored if the object exists.
+    coalesced: list[Webhook] = []
+    for webhook in sorted(webhooks, key=lambda queued_webhook: queued_webhook.message.transaction.timestamp):
+        merged = _merge(coalesced[-1], webhook) if any(coalesced) else None
+        if merged is not None:
+            coalesced[-1] = merged
+        else:
+            coalesced.append(webhook)
+
+    return coalesced
+
+
+def _merge(previous: Webhook, webhook: Webhook) -> Webhook | None:
+    previous_action = previous.message.action
+    action = webhook.message.action
+
+    if previous_action == 'Updated' and action == 'Updated':
+        changes = dict(previous.message.changes)
+        for key, change in webhook.message.changes.items():
+            previous_change = changes.get(key)
+            if previous_change is not None and _is_collection_change(previous_change) and _is_collection_change(change):
+                change = replace(
+                    change,
+                    added=(previous_change.added or []) + (change.added or []),
+                    removed=(previous_change.removed or []) + (change.removed or [])
+                )
+            changes[key] = change
+
+        return replace(webhook, message=replace(webhook.message, changes=changes))
+
+    # The recycle wins either way. When the object did not exist before the create, the recycle is ignored
+    # without a write. When it did, because the create was a redelivery, the recycle still deletes it.
+    if previous_action in ('Created', 'Updated') and action == 'Recycled':
+        return webhook
+
+    return None
+
+
+def _is_collection_change(change: Change) -> bool:
+    # Matches how hyper turns changes into column assignments.
+    return change.value is None and change.old_value is None
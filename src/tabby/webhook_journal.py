@@ -0,0 +1,233 @@
+from logging import getLogger
+from threading import Condition
+from typing import Any, TextIO
+
+from .request_schemas import Webhook
+
+_logger = getLogger(__name__)
+
+_JOURNAL_FILE_NAME = 'webhooks.journal'
+_CHECKPOINT_SECONDS = 60
+
+# Guards every journal global. Appends, fsyncs and checkpoints are serialized on it.
+_condition = Condition()
+_file: TextIO | None = None
+_next_sequence = 0
+# Lines appended to the open journal file, and how many of them are known to be on disk.
+_written_lines = 0
+_synced_lines = 0
+_is_syncing = False
+
+# Journal lines of the webhooks that have not been applied yet, by sequence.
+_pending: dict[int, str] = {}
+_applied_since_checkpoint = 0
+
+
+def start_webhook_journal() -> list[Webhook]:
+    # Opens the journal and returns the webhooks that were accepted but not applied before the last shutdown.
+    from atexit import register
+    from threading import Thread
+
+    global _next_sequence
+    entries, applied_sequences = _read_journal()
+    next_sequence = max((sequence for sequence, _, _ in entries), default=-1) + 1
+    entries = [entry for entry in entries if entry[0] not in applied_sequences]
+    if any(entries) and not _can_replay():
+        _logger.warning(f'Discarding {len(entries)} journaled webhook(s), the hyper databases were reloaded from Rally')
+        entries = []
+
+    webhooks = []
+    with _condition:
+        for sequence, webhook_json, line in entries:
+            try:
+                webhook = Webhook.from_json(webhook_json)
+            except Exception as ex:
+                _logger.warning(f'Skipping unreadable journaled webhook {sequence}: {ex}')
+                continue
+
+            webhook.journal_sequence = sequence
+            webhooks.append(webhook)
+            _pending[sequence] = line
+
+        _next_sequence = next_sequence
+        _rewrite_journal()
+
+    if any(webhooks):
+        _logger.info(f'Replaying {len(webhooks)} journaled webhook(s)')
+
+    thread_process = Thread(target=_checkpointer)
+    thread_process.name = 'webhook-journal-checkpointer'
+    thread_process.daemon = True
+    thread_process.start()
+    register(_checkpoint)
+
+    return webhooks
+
+
+def journal_webhook(webhook: Webhook, webhook_json: dict[str, Any]) -> None:
+    # Returns once the webhook is on disk.
+    from json import dumps
+
+    global _next_sequence
+    with _condition:
+        sequence = _next_sequence
+        _next_sequence += 1
+
+        line = dumps({'sequence': sequence, 'webhook': webhook_json}, separators=(',', ':')) + '\n'
+        _pending[sequence] = line
+        webhook.journal_sequence = sequence
+        _append(line)
+
+
+def mark_webhooks_applied(webhooks: list[Webhook]) -> None:
+    # Returns once the applied record is on disk, so the webhooks are never replayed after a restart.
+    from json import dumps
+
+    global _applied_since_checkpoint
+    with _condition:
+        applied_sequences = [
+            webhook.journal_sequence for webhook in webhooks
+            if webhook.journal_sequence is not None and _pending.pop(webhook.journal_sequence, None) is not None
+        ]
+        if not applied_sequences:
+            return
+
+        _applied_since_checkpoint += len(applied_sequences)
+        _append(dumps({'applied': applied_sequences}, separators=(',', ':')) + '\n')
+
+
+def _append(line: str) -> None:
+    # Appends a line and waits until it is on disk. Must be called holding _condition. Concurrent callers share
+    # fsyncs: whoever finds no fsync running syncs everything written so far, and the others wait for it
+    # instead of issuing their own.
+    from os import fsync
+
+    global _written_lines, _synced_lines, _is_syncing
+    _file.write(line)
+    _written_lines += 1
+    line_number = _written_lines
+
+    while _synced_lines < line_number:
+        if _is_syncing:
+            _condition.wait()
+            continue
+
+        _is_syncing = True
+        written_lines = _written_lines
+        file = _file
+        try:
+            file.flush()
+            _condition.release()
+            try:
+                fsync(file.fileno())
+            finally:
+                _condition.acquire()
+
+            _synced_lines = max(_synced_lines, written_lines)
+        finally:
+            _is_syncing = False
+            _condition.notify_all()
+
+
+def _checkpointer():
+    from time import sleep
+
+    while True:
+        sleep(_CHECKPOINT_SECONDS)
+        _checkpoint()
+
+
+def _checkpoint() -> None:
+    # Compacts the journal to the pending webhooks. Also runs on shutdown.
+    global _applied_since_checkpoint
+    with _condition:
+        if _applied_since_checkpoint == 0:
+            return
+
+        while _is_syncing:
+            _condition.wait()
+
+        try:
+            _rewrite_journal()
+            _logger.info(
+                f'Checkpointed the webhook journal, {_applied_since_checkpoint} applied, {len(_pending)} pending'
+            )
+            _applied_since_checkpoint = 0
+        except Exception as ex:
+            _logger.error(f'Failed to checkpoint the webhook journal: {ex}')
+
+
+def _rewrite_journal() -> None:
+    # Replaces the journal with only the pending webhooks. Must be called holding _condition with no fsync running.
+    from os import O_RDONLY, close, fsync, open as open_fd, replace
+
+    global _file, _written_lines, _synced_lines
+    path = _get_journal_path()
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        file.writelines(_pending[sequence] for sequence in sorted(_pending))
+        file.flush()
+        fsync(file.fileno())
+
+    if _file is not None:
+        _file.close()
+    replace(f'{path}.tmp', path)
+
+    # Make the rename itself durable.
+    directory_fd = open_fd(_get_journal_dir(), O_RDONLY)
+    try:
+        fsync(directory_fd)
+    finally:
+        close(directory_fd)
+
+    _file = open(path, 'a', encoding='utf-8')
+    _written_lines = 0
+    _synced_lines = 0
+
+
+def _read_journal() -> tuple[list[tuple[int, dict[str, Any], str]], set[int]]:
+    # Returns the journaled webhooks, and the sequences of those recorded as applied.
+    from json import loads
+    from os.path import exists
+
+    path = _get_journal_path()
+    if not exists(path):
+        return [], set()
+
+    entries = []
+    applied_sequences: set[int] = set()
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                entry = loads(line)
+                if 'applied' in entry:
+                    applied_sequences.update(int(sequence) for sequence in entry['applied'])
+                else:
+                    entries.append((int(entry['sequence']), entry['webhook'], line.rstrip('\n') + '\n'))
+            except Exception:
+                # Only the last line can be torn, by a crash in the middle of an append.
+                _logger.warning(f'Skipping a torn line in the webhook journal {path}')
+
+    return entries, applied_sequences
+
+
+def _can_replay() -> bool:
+    from .args import args
+
+    # Journaled webhooks are older than anything loaded or synced from Rally on start, so replaying them
+    # is only right on top of databases that were reopened as they were.
+    return args.hyper_persist and not args.rally_refresh_on_start and not args.rally_incremental_sync
+
+
+def _get_journal_path() -> str:
+    from pathlib import PurePath
+
+    return str(PurePath(_get_journal_dir(), _JOURNAL_FILE_NAME))
+
+
+def _get_journal_dir() -> str:
+    from os import makedirs
+
+    from .args import args
+
+    makedirs(args.tableau_datasource_dir, exist_ok=True)
+    return args.tableau_datasource_dir
@@ -1,29 +1,174 @@
 from logging import getLogger
-from queue import PriorityQueue
-from time import time
+from threading import Lock
 
+from .dedup_cache import DedupCache
+from .delay_queue import DelayQueue
 from .request_schemas import Webhook
 
 _logger = getLogger(__name__)
 
-_priority_queue: PriorityQueue[tuple[int, float, Webhook]] = PriorityQueue()
+# One queue per worker. Each entity always maps to the same worker, so its webhooks stay in order.
+# Queued items are groups of webhooks for the same object, which only grow when coalescing.
+_webhook_queues: dict[int, DelayQueue[list[Webhook]]] = {}
+_webhook_queues_lock = Lock()
+
+# The queued group of each object and when it was queued, while coalescing. Later webhooks for the object join
+# its group, which restarts the group's buffer delay so that every member waits the full buffer.
+_pending_groups: dict[str, tuple[list[Webhook], float]] = {}
+_pending_groups_lock = Lock()
+
+# Webhooks enqueued and not yet taken by a processor. Queue entries are groups, so their count can be much lower.
+_queued_webhook_count = 0
+
+# The (message_id, trace_id) of recently enqueued webhooks, so that redelivered and replayed webhooks are dropped.
+_dedup_cache: DedupCache[tuple[str, str]] | None = None
+
+_QUEUE_STATS_LOG_SECONDS = 60
+
+# A group stops taking webhooks after this many buffer delays, so a stream of updates to one object cannot hold
+# back the queue forever. Later webhooks for the object start a new group behind it.
+_MAX_GROUP_DELAYS = 5
 
 
 def start_webhook_processor() -> None:
     from threading import Thread
 
-    thread_process = Thread(target=_webhook_processor)
-    thread_process.daemon = True
-    thread_process.start()
+    from .args import args
+    from .profiler import WEBHOOKS, start_profile
+
+    if args.profile_webhook_seconds > 0:
+        start_profile(WEBHOOKS, args.profile_webhook_seconds)
 
+    for worker in range(_get_worker_count()):
+        thread_process = Thread(target=_webhook_processor, args=(_get_webhook_queue(worker),))
+        thread_process.name = f'webhook-worker-{worker}'
+        thread_process.daemon = True
+        thread_process.start()
 
-def enqueue_webhook_for_processing(webhook: Webhook) -> None:
-    _priority_queue.put((webhook.message.transaction.timestamp, time(), webhook))
 
+def enqueue_webhook_for_processing(webhook: Webhook, deduplicate: bool = True) -> bool:
+    from time import time
+
+    from .args import args
+
+    # Returns False if the webhook was dropped as a duplicate.
+    # Callers that already checked is_duplicate_webhook pass deduplicate=False.
+    if deduplicate and is_duplicate_webhook(webhook):
+        return False
+
+    global _queued_webhook_count
+    webhook_queue = _get_webhook_queue(_get_worker(webhook.message.object_type))
+    if not args.rally_webhook_coalesce:
+        with _pending_groups_lock:
+            _queued_webhook_count += 1
+        webhook_queue.put(webhook.message.transaction.timestamp, [webhook])
+        return True
+
+    with _pending_groups_lock:
+        _queued_webhook_count += 1
+        group, queued_time = _pending_groups.get(webhook.message.object_id, (None, 0.0))
+        is_group_open = args.rally_webhook_buffer <= 0 or time() - queued_time < _MAX_GROUP_DELAYS * args.rally_webhook_buffer
+        if group is not None and is_group_open:
+            group.append(webhook)
+            # The group keeps its place in timestamp order, but waits the buffer again for the new webhook.
+            webhook_queue.touch(group)
+            return True
+
+        group = [webhook]
+        _pending_groups[webhook.message.object_id] = (group, time())
+        webhook_queue.put(webhook.message.transaction.timestamp, group)
+        return True
+
+
+def is_duplicate_webhook(webhook: Webhook) -> bool:
+    # Records the webhook, so it returns True for any later delivery of the same message.
+    dedup_cache = _get_dedup_cache()
+    if dedup_cache is not None and dedup_cache.seen((webhook.message.message_id, webhook.message.transaction.trace_id)):
+        _logger.info(f'Dropped duplicate webhook {webhook.message.message_id}')
+        return True
+
+    return False
+
+
+def is_webhook_queue_full() -> bool:
+    from .args import args
+
+    return 0 < args.rally_webhook_queue_limit <= get_queue_depth()
+
+
+def notify_webhook_processor() -> None:
+    # Wakes the processors so that they re-check webhooks waiting on a closed connection.
+    for webhook_queue in list(_webhook_queues.values()):
+        webhook_queue.notify()
+
+
+def get_queue_depth() -> int:
+    return _queued_webhook_count
+
+
+def get_queue_oldest_age() -> float:
+    return max((webhook_queue.oldest_age() for webhook_queue in list(_webhook_queues.values())), default=0.0)
+
+
+def get_dedup_stats() -> tuple[int, int]:
+    # The number of duplicate webhooks dropped and of unique webhooks let through.
+    dedup_cache = _get_dedup_cache()
+    if dedup_cache is None:
+        return 0, 0
+
+    return dedup_cache.hits, dedup_cache.misses
+
+
+def _get_worker_count() -> int:
+    from .args import args
+
+    return max(1, min(args.rally_webhook_workers, len(args.rally_entities)))
+
+
+def _get_worker(entity_type: str) -> int:
+    from zlib import crc32
+
+    from .args import args
+
+    if entity_type in args.rally_entities:
+        return args.rally_entities.index(entity_type) % _get_worker_count()
+
+    return crc32(entity_type.encode()) % _get_worker_count()
+
+
+def _get_dedup_cache() -> DedupCache[tuple[str, str]] | None:
+    from .args import args
+
+    global _dedup_cache
+    if args.rally_webhook_dedup_size <= 0:
+        return None
+
+    with _webhook_queues_lock:
+        if _dedup_cache is None:
+            _dedup_cache = DedupCache(args.rally_webhook_dedup_size, args.rally_webhook_dedup_ttl)
+
+        return _dedup_cache
+
+
+def _get_webhook_queue(worker: int) -> DelayQueue[list[Webhook]]:
+    with _webhook_queues_lock:
+        if worker not in _webhook_queues:
+            _webhook_queues[worker] = DelayQueue()
+
+        return _webhook_queues[worker]
+
+
+def _webhook_processor(webhook_queue: DelayQueue[list[Webhook]]):
+    from time import time
 
-def _webhook_processor():
     from .args import args
     from .hyper import is_open, process_changes
+    from .metrics import WEBHOOKS_APPLIED
+    from .profiler import WEBHOOKS, profile_entity, profile_phase
+    from .webhook_coalescer import coalesce_webhooks
+    from .webhook_journal import mark_webhooks_applied
+
+    last_stats_log = time()
 
     # Buffer to account for potential latency from Rally service.
     # We want to process webhooks in the order that they were created by Rally users.
@@ -31,17 +176,75 @@ def _webhook_processor():
     # However, latency could cause the early webhooks to arrive here late.
     # We add a buffer to allow any late arriving webhooks to queue into the correct order.
     # Rally documented a potential latency of 2 seconds, so we're defaulting with that.
+    # The queue sleeps until the earliest webhook has been buffered and its connection is open.
     while True:
-        timestamp, queued_time, webhook = _priority_queue.get()
+        groups = webhook_queue.get(
+            delay=args.rally_webhook_buffer,
+            is_ready=lambda group: is_open(group[0].message.object_type),
+            max_items=None if args.rally_webhook_batch else 1
+        )
+
+        received_webhooks = [webhook for group in groups for webhook in _take_group(group)]
+        webhooks = received_webhooks
+        if args.rally_webhook_coalesce:
+            with profile_phase(WEBHOOKS, 'coalesce'):
+                webhooks = [webhook for group in groups for webhook in coalesce_webhooks(group)]
+            if len(webhooks) < len(received_webhooks):
+                _logger.info(f'Coalesced {len(received_webhooks)} webhook(s) into {len(webhooks)}')
+
+        if time() - last_stats_log >= _QUEUE_STATS_LOG_SECONDS:
+            last_stats_log = time()
+            dedup_hits, dedup_misses = get_dedup_stats()
+            _logger.info(
+                f'Webhook queue depth {get_queue_depth()}, oldest webhook {get_queue_oldest_age():.1f}s, '
+                f'{dedup_hits} duplicate(s) dropped of {dedup_hits + dedup_misses}'
+            )
+
+        with profile_phase(WEBHOOKS, 'apply'):
+            if args.rally_webhook_batch:
+                _process_webhook_batch(webhooks)
+            else:
+                for webhook in webhooks:
+                    try:
+                        with profile_entity(WEBHOOKS, 'apply', webhook.message.object_type):
+                            process_changes(webhook)
+                    except Exception as ex:
+                        WEBHOOKS_APPLIED.inc(webhook.message.object_type, webhook.message.action, 'error')
+                        _logger.error(str(ex))
 
-        # If the webhook has not been in queue for rally_webhook_buffer seconds, put it back.
-        if time() - queued_time < args.rally_webhook_buffer or not is_open(webhook.message.object_type):
-            _priority_queue.put((timestamp, queued_time, webhook))
-            continue
+        # Failed webhooks are marked too, so they are not retried on every restart.
+        if args.rally_webhook_journal:
+            with profile_phase(WEBHOOKS, 'journal'):
+                mark_webhooks_applied(received_webhooks)
 
+
+def _take_group(group: list[Webhook]) -> list[Webhook]:
+    # Stops the group from growing, so that it can be processed.
+    global _queued_webhook_count
+    with _pending_groups_lock:
+        _queued_webhook_count -= len(group)
+        object_id = group[0].message.object_id
+        if _pending_groups.get(object_id, (None,))[0] is group:
+            del _pending_groups[object_id]
+
+    return group
+
+
+def _process_webhook_batch(webhooks: list[Webhook]) -> None:
+    from .hyper import process_changes_batch
+    from .metrics import WEBHOOKS_APPLIED
+    from .profiler import WEBHOOKS, profile_entity
+
+    # Webhooks are drained in timestamp order, so each entity group stays in timestamp order.
+    webhooks_by_entity: dict[str, list[Webhook]] = {}
+    for webhook in webhooks:
+        webhooks_by_entity.setdefault(webhook.message.object_type, []).append(webhook)
+
+    for entity_type, entity_webhooks in webhooks_by_entity.items():
         try:
-            process_changes(webhook)
+            with profile_entity(WEBHOOKS, 'apply', entity_type):
+                process_changes_batch(entity_type, entity_webhooks)
         except Exception as ex:
+            for webhook in entity_webhooks:
+                WEBHOOKS_APPLIED.inc(entity_type, webhook.message.action, 'error')
             _logger.error(str(ex))
-
-        _priority_queue.task_done()